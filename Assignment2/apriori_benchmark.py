@@ -0,0 +1,200 @@
+from __future__ import print_function
+import argparse
+import json
+import math
+import random
+import time
+import tracemalloc
+from bisect import bisect_left
+
+from apriori_templete import *
+
+
+def poisson(rng, mean):
+    '''Draws a Poisson distributed integer (Knuth's method)'''
+    limit = math.exp(-mean)
+    k, p = 0, rng.random()
+    while p > limit:
+        k += 1
+        p *= rng.random()
+    return k
+
+
+def generate_transactions(save_filename, n_transactions=10000, avg_len=10, n_items=1000,
+                          n_patterns=2000, avg_pattern_len=4, correlation=0.5, seed=0):
+    '''Writes an IBM Quest style synthetic transaction file
+
+    Transactions are built from a pool of potentially frequent itemsets
+    (patterns), as in the generator of Agrawal and Srikant:
+    - pattern lengths are Poisson around avg_pattern_len, and each pattern
+      takes an exponentially distributed fraction (mean correlation) of its
+      items from the previous pattern, the rest at random
+    - patterns are picked with exponentially distributed weights, and
+      each one has a corruption level: items are dropped from a picked
+      pattern while a uniform draw stays below it
+    - transaction lengths are Poisson around avg_len; a pattern that does
+      not fit is added anyway half of the time, otherwise it starts the
+      next transaction
+
+    Parameters:
+    ------------
+    save_filename : str
+        the transaction file to write, one comma separated transaction per line
+    n_transactions, avg_len, n_items : int
+        |D|, |T| and N of the generator
+    n_patterns, avg_pattern_len : int
+        |L| and |I| of the generator
+    correlation : float
+        mean fraction of items a pattern shares with the previous one
+    seed : int
+        seed of the random generator
+
+    Returns:
+    ------------
+    save_filename : str
+    '''
+    rng = random.Random(seed)
+
+    patterns = []
+    for i in range(n_patterns):
+        size = max(poisson(rng, avg_pattern_len - 1) + 1, 1)
+        pattern = set()
+        if patterns:
+            shared = min(int(rng.expovariate(1.0 / correlation) * size), size, len(patterns[-1]))
+            pattern.update(rng.sample(sorted(patterns[-1]), shared))
+        while len(pattern) < size:
+            pattern.add(rng.randrange(n_items))
+        patterns.append(pattern)
+    weights = [rng.expovariate(1.0) for pattern in patterns]
+    corruption = [min(max(rng.normalvariate(0.5, 0.1), 0.0), 1.0) for pattern in patterns]
+
+    total = sum(weights)
+    cumulative = []
+    acc = 0.0
+    for w in weights:
+        acc += w / total
+        cumulative.append(acc)
+
+    def pick():
+        index = bisect_left(cumulative, rng.random())
+        index = min(index, n_patterns - 1)
+        items = sorted(patterns[index])
+        while items and rng.random() < corruption[index]:
+            items.pop(rng.randrange(len(items)))
+        return items
+
+    with open(save_filename, 'w') as fw:
+        carry = None
+        for t in range(n_transactions):
+            size = max(poisson(rng, avg_len), 1)
+            transaction = set()
+            if carry:
+                transaction.update(carry)
+                carry = None
+            while len(transaction) < size:
+                items = pick()
+                if len(transaction) + len(items) > size and transaction:
+                    if rng.random() < 0.5:
+                        transaction.update(items)
+                    else:
+                        carry = items
+                    break
+                transaction.update(items)
+            fw.write(','.join('item_%d' % i for i in sorted(transaction)) + '\n')
+
+    return save_filename
+
+
+# every mining backend, called as engine(data_path, dataset, min_support, stats)
+ENGINES = {
+    'apriori':  lambda path, dataset, s, stats: apriori(dataset, s, stats=stats),
+    'apriori-bitset': lambda path, dataset, s, stats: apriori(dataset, s, counter='bitset', stats=stats),
+    'apriori-parallel': lambda path, dataset, s, stats: apriori(dataset, s, n_jobs=-1, stats=stats),
+    'fpgrowth': lambda path, dataset, s, stats: fpgrowth(dataset, s),
+    'eclat':    lambda path, dataset, s, stats: eclat(dataset, s),
+    'son':      lambda path, dataset, s, stats: son(path, s, partition_size=max(len(dataset) // 4, 1)),
+    'toivonen': lambda path, dataset, s, stats: toivonen(path, s, sample_size=max(len(dataset) // 10, 1), seed=0),
+    'charm':    lambda path, dataset, s, stats: charm(dataset, s),
+    'maxminer': lambda path, dataset, s, stats: maxminer(dataset, s),
+}
+
+
+def benchmark(data_path, min_supports, engines=None, measure_memory=True):
+    '''Times every mining backend on a transaction file
+
+    Each engine runs once per min_support for timing. With measure_memory,
+    it runs a second time under tracemalloc to record the peak Python
+    heap, so tracing does not distort the timing.
+
+    Returns:
+    ------------
+    results : list of dict
+        one entry per (engine, min_support) with the total seconds, the
+        number of frequent and counted itemsets, the peak memory and,
+        for the apriori engines, the per-level candidate counts and times
+    '''
+    dataset = loadDataSet(data_path)
+    results = []
+    for name in engines or sorted(ENGINES):
+        for min_support in min_supports:
+            stats = []
+            start = time.time()
+            F, support_data = ENGINES[name](data_path, dataset, min_support, stats)
+            seconds = time.time() - start
+
+            result = {'engine': name,
+                      'min_support': min_support,
+                      'seconds': seconds,
+                      'frequent': sum(map(len, F)),
+                      'counted': len(support_data),
+                      'levels': stats}
+            if measure_memory:
+                tracemalloc.start()
+                ENGINES[name](data_path, dataset, min_support, [])
+                result['peak_bytes'] = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+            results.append(result)
+            print('%-16s min_support=%-6g %8.3fs  frequent=%d' % (name, min_support, seconds, result['frequent']))
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark the apriori_templete mining backends on synthetic data')
+    parser.add_argument('output', help='JSON report to write')
+    parser.add_argument('--data', help='existing transaction file; skips the generator')
+    parser.add_argument('--transactions', type=int, default=10000)
+    parser.add_argument('--avg-len', type=int, default=10)
+    parser.add_argument('--items', type=int, default=1000)
+    parser.add_argument('--patterns', type=int, default=2000)
+    parser.add_argument('--pattern-len', type=int, default=4)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--supports', type=float, nargs='+', default=[0.02, 0.01, 0.005])
+    parser.add_argument('--engines', nargs='+', choices=sorted(ENGINES))
+    parser.add_argument('--no-memory', action='store_true', help='skip the tracemalloc runs')
+    args = parser.parse_args()
+
+    data_path = args.data
+    if data_path is None:
+        data_path = 'T%dI%dD%d.txt' % (args.avg_len, args.pattern_len, args.transactions)
+        generate_transactions(data_path, args.transactions, args.avg_len, args.items,
+                              args.patterns, args.pattern_len, seed=args.seed)
+
+    generator = None
+    if args.data is None:
+        generator = {'transactions': args.transactions, 'avg_len': args.avg_len,
+                     'items': args.items, 'patterns': args.patterns,
+                     'pattern_len': args.pattern_len, 'seed': args.seed}
+    report = {'data': data_path,
+              'generator': generator,
+              'results': benchmark(data_path, args.supports, args.engines, not args.no_memory)}
+    with open(args.output, 'w') as fw:
+        json.dump(report, fw, indent=2)
+
+    '''
+    Example:
+
+    python apriori_benchmark.py bench.json --transactions 10000 --supports 0.02 0.01
+
+    python apriori_benchmark.py bench.json --data gene_data_transaction.txt --supports 0.5 0.4 --engines apriori eclat
+
+    '''
@@ -1,9 +1,15 @@
 from __future__ import print_function
 import sys
+import multiprocessing
+import pickle
+import heapq
+import random
+import time
+from array import array
 
 
 
-def apriori(dataset, min_support=0.5, verbose=False):
+def apriori(dataset, min_support=0.5, verbose=False, counter='subset', n_jobs=1, stats=None):
     """Implements the Apriori algorithm.
 
     The Apriori algorithm will iteratively generate new candidate
@@ -19,6 +25,24 @@ def apriori(dataset, min_support=0.5, verbose=False):
     min_support : float
         The minimum support threshold. Defaults to 0.5.
 
+    counter : str
+        The support counting backend. 'subset' (the default) tests every
+        candidate against every transaction with get_freq_weighted, after
+        reduce_transactions has shrunk the transactions for the level;
+        'bitset' builds one TID bitset per item and counts with
+        get_freq_bitset.
+
+    n_jobs : int
+        The number of processes counting support. With more than one, the
+        transactions are split into n_jobs shards counted in parallel by
+        get_freq_parallel. -1 uses every core. Defaults to 1. Where the
+        'fork' start method is unavailable, counting stays in one process.
+
+    stats : list
+        If given, a dict is appended for every level k with the number of
+        candidates, the number of frequent itemsets and the seconds spent
+        generating and counting them.
+
     Returns
     -------
     F : list
@@ -33,26 +57,56 @@ def apriori(dataset, min_support=0.5, verbose=False):
            Rules", 1994.
 
     """
-    C1 = create_candidates(dataset)
-    D = list(map(set, dataset))
-    F1, support_data = get_freq(D, C1, min_support, verbose=False) # get frequent 1-itemsets
+    start = time.time()
+    items, indptr, indices = encode_dataset(dataset)
+    D = list(map(set, iter_transactions(indptr, indices)))
+    C1 = create_candidates(D)
+    if counter not in ('subset', 'bitset'):
+        raise ValueError("counter must be one of {'subset', 'bitset'}")
+    if n_jobs == -1:
+        n_jobs = multiprocessing.cpu_count()
+    WD = None # weighted, reduced transactions of the 'subset' counter
+    if n_jobs > 1 and 'fork' in multiprocessing.get_all_start_methods():
+        shards = shard_dataset(D, n_jobs, counter)
+        count = lambda candidates: get_freq_parallel(shards, len(D), candidates, min_support, n_jobs)
+    elif counter == 'subset':
+        WD = reduce_transactions(((t, 1) for t in D), C1, 1)
+        count = lambda candidates: get_freq_weighted(WD, len(D), candidates, min_support)
+    else:
+        bitsets = build_bitsets(D)
+        count = lambda candidates: get_freq_bitset(bitsets, len(D), candidates, min_support)
+    F1, support_data = count(C1) # get frequent 1-itemsets
     F = [F1] # list of frequent itemsets; initialized to frequent 1-itemsets
+    if stats is not None:
+        stats.append({'k': 1, 'candidates': len(C1), 'frequent': len(F1), 'seconds': time.time() - start})
     k = 2 # the itemset cardinality
     while (len(F[k - 2]) > 0):
+        start = time.time()
         Ck = apriori_gen(F[k-2], k) # generate candidate itemsets
-        Fk, supK  = get_freq(D, Ck, min_support) # get frequent itemsets
+        if WD is not None:
+            WD = reduce_transactions(WD, F[k-2], k) # shrink the transactions for this level
+        Fk, supK  = count(Ck) # get frequent itemsets
         support_data.update(supK)# update the support counts to reflect pruning
         F.append(Fk)  # add the frequent k-itemsets to the list of frequent itemsets
+        if stats is not None:
+            stats.append({'k': k, 'candidates': len(Ck), 'frequent': len(Fk), 'seconds': time.time() - start})
         k += 1
 
+    F, support_data = decode_freq(F, support_data, items)
+
     if verbose:
-        # Print a list of all the frequent itemsets.
-        for kset in F:
-            for item in kset:
-                print(""                     + "{"                     + "".join(str(i) + ", " for i in iter(item)).rstrip(', ')                     + "}"                     + ":  sup = " + str(round(support_data[item], 3)))
+        print_freq(F, support_data)
 
     return F, support_data
 
+
+def print_freq(F, support_data):
+    """Prints every frequent itemset of F together with its support."""
+    for kset in F:
+        for item in kset:
+            print(""                     + "{"                     + "".join(str(i) + ", " for i in iter(item)).rstrip(', ')                     + "}"                     + ":  sup = " + str(round(support_data[item], 3)))
+
+
 def create_candidates(dataset, verbose=False):
     """Creates a list of candidate 1-itemsets from a list of transactions.
 
@@ -67,12 +121,10 @@ def create_candidates(dataset, verbose=False):
     The list of candidate itemsets (c1) passed as a frozenset (a set that is
     immutable and hashable).
     """
-    c1 = [] # list of all items in the database of transactions
+    c1 = set() # set of all items in the database of transactions
     for transaction in dataset:
-        for item in transaction:
-            if not [item] in c1:
-                c1.append([item])
-    c1.sort()
+        c1.update(transaction)
+    c1 = sorted([item] for item in c1)
 
     if verbose:
         # Print a list of all the candidate items.
@@ -81,6 +133,82 @@ def create_candidates(dataset, verbose=False):
     # Map c1 to a frozenset because it will be the key of a dictionary.
     return list(map(frozenset, c1))
 
+def encode_dataset(dataset):
+    """Maps item strings to dense integer ids and packs the transactions.
+
+    Ids are given in sorted item order, so sorting ids sorts the items they
+    stand for. The transactions are stored CSR-style: the sorted ids of
+    transaction t are indices[indptr[t]:indptr[t + 1]].
+
+    Parameters
+    ----------
+    dataset : list
+        The dataset (a list of transactions).
+
+    Returns
+    -------
+    items : list
+        The item of every id, i.e. items[id] is the original item.
+
+    indptr : array
+        The int64 offsets of every transaction in indices.
+
+    indices : array
+        The int32 item ids of all transactions, back to back.
+    """
+    item_ids = {}
+    for transaction in dataset:
+        for item in transaction:
+            item_ids[item] = None
+    items = sorted(item_ids)
+    for i, item in enumerate(items):
+        item_ids[item] = i
+
+    indptr = array('q', [0])
+    indices = array('i')
+    for transaction in dataset:
+        indices.extend(sorted(set(item_ids[item] for item in transaction)))
+        indptr.append(len(indices))
+
+    return items, indptr, indices
+
+
+def iter_transactions(indptr, indices):
+    """Yields the id array of every transaction encoded by encode_dataset."""
+    for t in range(len(indptr) - 1):
+        yield indices[indptr[t]:indptr[t + 1]]
+
+
+def decode_freq(F, support_data, items):
+    """Translates id itemsets in F and support_data back to the items.
+
+    Parameters
+    ----------
+    F : list
+        The list of frequent itemsets, as frozensets of ids.
+
+    support_data : dict
+        The support data, keyed by frozensets of ids.
+
+    items : list
+        The item of every id, as returned by encode_dataset.
+
+    Returns
+    -------
+    F : list
+        The list of frequent itemsets, as frozensets of items.
+
+    support_data : dict
+        The support data, keyed by frozensets of items.
+    """
+    decoded = dict((itemset, frozenset(items[i] for i in itemset))
+                   for itemset in support_data)
+    F = [[decoded[itemset] for itemset in kset] for kset in F]
+    support_data = dict((decoded[itemset], support)
+                        for itemset, support in support_data.items())
+    return F, support_data
+
+
 def get_freq(dataset, candidates, min_support, verbose=False):
     """
 
@@ -139,6 +267,233 @@ def get_freq(dataset, candidates, min_support, verbose=False):
     return freq_list, support_data
 
 
+def reduce_transactions(dataset, freq_sets, k):
+    """Shrinks weighted transactions before counting candidate k-itemsets.
+
+    An item outside every frequent (k-1)-itemset is in no candidate
+    k-itemset, and a transaction with fewer than k items contains none, so
+    both are dropped. Transactions that become identical are then merged
+    into one entry whose weight is the sum of theirs. Support counts are
+    unchanged.
+
+    Parameters
+    ----------
+    dataset : iterable
+        (transaction, weight) pairs.
+
+    freq_sets : list
+        The frequent (k-1)-itemsets (or the 1-itemsets to keep, for k = 1).
+
+    k : integer
+        The cardinality of the candidates about to be counted.
+
+    Returns
+    -------
+    reduced : list
+        (frozenset transaction, weight) pairs.
+    """
+    keep = frozenset().union(*freq_sets)
+    weights = {}
+    for transaction, weight in dataset:
+        transaction = keep.intersection(transaction)
+        if len(transaction) >= k:
+            weights[transaction] = weights.get(transaction, 0) + weight
+    return list(weights.items())
+
+
+def get_freq_weighted(dataset, n_transactions, candidates, min_support, verbose=False):
+    """Counterpart of get_freq for the weighted transactions returned by
+    reduce_transactions; n_transactions is the number of transactions they
+    stand for, which sets the minimum support count."""
+    min_sup = n_transactions * min_support
+
+    support_data = {}
+    freq_list = []
+
+    for cand in candidates:
+        support = 0
+        for data, weight in dataset:
+            if cand.issubset(data):
+                support += weight
+        if support >= min_sup:
+            freq_list.append(cand)
+        support_data[cand] = support
+
+    return freq_list, support_data
+
+
+def build_bitsets(dataset):
+    """Builds the vertical layout of a dataset: one TID bitset per item.
+
+    Bit t of an item's bitset is set when transaction t contains the item.
+    Each bitset is packed into a Python int, so intersecting the TID sets
+    of several items is a single '&' per item.
+
+    Parameters
+    ----------
+    dataset : list
+        The dataset (a list of transactions).
+
+    Returns
+    -------
+    bitsets : dict
+        Maps each item to the Python int holding its TID bitset.
+    """
+    n_bytes = (len(dataset) + 7) // 8
+    buffers = {}
+    for tid, transaction in enumerate(dataset):
+        byte, bit = divmod(tid, 8)
+        for item in transaction:
+            if item not in buffers:
+                buffers[item] = bytearray(n_bytes)
+            buffers[item][byte] |= 1 << bit
+
+    return dict((item, int.from_bytes(bytes(buf), 'little'))
+                for item, buf in buffers.items())
+
+
+def _popcount(bits):
+    """Counts the set bits of a non-negative Python int."""
+    return bin(bits).count('1')
+
+if hasattr(int, 'bit_count'):
+    _popcount = int.bit_count
+
+
+def get_freq_bitset(bitsets, n_transactions, candidates, min_support, verbose=False):
+    """Bitset counterpart of get_freq.
+
+    The support of a candidate is the popcount of the AND of its items'
+    TID bitsets, so no transaction is scanned. Candidates that share the
+    same sorted (k-1)-prefix (all siblings produced by apriori_gen) reuse
+    the AND of that prefix.
+
+    Parameters
+    ----------
+    bitsets : dict
+        The item -> TID bitset mapping returned by build_bitsets.
+
+    n_transactions : int
+        The number of transactions the bitsets were built from.
+
+    candidates : frozenset
+        The list of candidate itemsets.
+
+    min_support : float
+        The minimum support threshold.
+
+    Returns
+    -------
+    freq_list : list
+        The list of frequent itemsets.
+
+    support_data : dict
+        The support data for all candidate itemsets.
+    """
+    min_sup = n_transactions * min_support
+
+    support_data = {}
+    freq_list = []
+    prefix_bits = {}
+
+    for cand in candidates:
+        items = sorted(cand)
+        prefix = tuple(items[:-1])
+        if prefix not in prefix_bits:
+            bits = -1  # all ones
+            for item in prefix:
+                bits &= bitsets.get(item, 0)
+            prefix_bits[prefix] = bits
+        support = _popcount(prefix_bits[prefix] & bitsets.get(items[-1], 0))
+        if support >= min_sup:
+            freq_list.append(cand)
+        support_data[cand] = support
+
+    return freq_list, support_data
+
+
+_shared = {}  # state handed to the forked get_freq_parallel workers
+
+
+def shard_dataset(dataset, n_shards, counter='subset'):
+    """Splits a dataset into n_shards contiguous shards for get_freq_parallel.
+
+    With the 'subset' counter a shard is a list of transaction sets; with
+    'bitset' it is the (bitsets, n_transactions) pair of its transactions.
+    """
+    size = max(-(-len(dataset) // n_shards), 1)  # ceil
+    shards = [dataset[start:start + size] for start in range(0, len(dataset), size)]
+    if counter == 'bitset':
+        shards = [(build_bitsets(shard), len(shard)) for shard in shards]
+    return shards
+
+
+def _count_shard(i):
+    """Counts _shared['candidates'] on shard i; runs in a worker process."""
+    shard, candidates = _shared['shards'][i], _shared['candidates']
+    if isinstance(shard, tuple):
+        support_data = get_freq_bitset(shard[0], shard[1], candidates, 0)[1]
+    else:
+        support_data = get_freq(shard, candidates, 0)[1]
+    return [support_data[cand] for cand in candidates]
+
+
+def get_freq_parallel(shards, n_transactions, candidates, min_support, n_jobs):
+    """Count distribution counterpart of get_freq.
+
+    Every worker counts all candidates on its own shard of the transactions,
+    and the per-shard counts are summed before min_support is applied, so
+    the result is exactly that of get_freq. The shards and candidates are
+    not pickled: they are stored in a module global before the pool is
+    forked and the workers inherit them, so only the counts travel back.
+
+    Parameters
+    ----------
+    shards : list
+        The shards returned by shard_dataset.
+
+    n_transactions : int
+        The total number of transactions in the shards.
+
+    candidates : frozenset
+        The list of candidate itemsets.
+
+    min_support : float
+        The minimum support threshold.
+
+    n_jobs : int
+        The number of worker processes.
+
+    Returns
+    -------
+    freq_list : list
+        The list of frequent itemsets.
+
+    support_data : dict
+        The support data for all candidate itemsets.
+    """
+    min_sup = n_transactions * min_support
+
+    _shared['shards'] = shards
+    _shared['candidates'] = candidates
+    pool = multiprocessing.get_context('fork').Pool(n_jobs)
+    try:
+        shard_counts = pool.map(_count_shard, range(len(shards)))
+    finally:
+        pool.close()
+        pool.join()
+        _shared.clear()
+
+    support_data = {}
+    freq_list = []
+    for cand, support in zip(candidates, map(sum, zip(*shard_counts))):
+        if support >= min_sup:
+            freq_list.append(cand)
+        support_data[cand] = support
+
+    return freq_list, support_data
+
+
 
 def apriori_gen(freq_sets, k):
     """Generates candidate itemsets (via the F_k-1 x F_k-1 method).
@@ -150,6 +505,8 @@ def apriori_gen(freq_sets, k):
     (1) Generate length k candidate itemsets from length k-1 frequent itemsets
     (2) Prune candidate itemsets containing subsets of length k-1 that are infrequent
 
+    The work is done on sorted tuples by gen_candidates.
+
     Parameters
     ----------
     freq_sets : list
@@ -163,100 +520,1206 @@ def apriori_gen(freq_sets, k):
     candidate_list : list
         The list of candidate itemsets.
     """
+    freq_tuples = [tuple(sorted(itemset)) for itemset in freq_sets]
+    candidate_list = list(map(frozenset, gen_candidates(freq_tuples, k)))
+
+    return candidate_list
 
 
-    ##  CANDIDATE LIST GENERATION
+def gen_candidates(freq_tuples, k):
+    """Generates and prunes candidate k-itemsets kept as sorted tuples.
+
+    The frequent (k-1)-itemsets are grouped by their (k-2)-prefix, so only
+    siblings that share a prefix are joined, and the (k-1)-subsets of each
+    candidate are looked up in a hash set. Candidates come out in the same
+    order as the pairwise F_k-1 x F_k-1 join.
+
+    Parameters
+    ----------
+    freq_tuples : list
+        The frequent (k-1)-itemsets, each a sorted tuple.
+
+    k : integer
+        The cardinality of the candidates to generate.
+
+    Returns
+    -------
+    candidate_list : list
+        The candidate k-itemsets, each a sorted tuple.
+    """
+    siblings = {}  # (k-2)-prefix -> frequent itemsets with that prefix
+    for itemset in freq_tuples:
+        siblings.setdefault(itemset[:k - 2], []).append(itemset)
+    position = {}  # index of each itemset within its sibling group
+    for group in siblings.values():
+        for i, itemset in enumerate(group):
+            position[itemset] = i
+    freq_index = set(freq_tuples)
 
-    #print(freq_sets)
     candidate_list = []
-    #print(freq_sets)
-    if k == 2:  # if the candidates are single items, just combine them
-        for i in range(len(freq_sets)):
-            for j in range(i + 1, len(freq_sets)):
-                candidate_list.append(freq_sets[i] | freq_sets[j])
-    else:
-        for i in range(len(freq_sets)):  # otherwise use the Fk-1 * Fk-1 method
-            for j in range(i + 1, len(freq_sets)):
-                one = sorted(list(freq_sets[i]))
-                two = sorted(list(freq_sets[j]))
-                #print(one[:k - 2], two[:k - 2])
-                #print()
+    for one in freq_tuples:
+        prefix = one[:k - 2]
+        group = siblings[prefix]
+        for two in group[position[one] + 1:]:
+            if one[-1] < two[-1]:
+                cand = one + two[-1:]
+            else:
+                cand = prefix + two[-1:] + one[-1:]
+            # the subsets without one of the last two items are one and two
+            if all(cand[:i] + cand[i + 1:] in freq_index for i in range(k - 2)):
+                candidate_list.append(cand)
 
-                if one[:k - 2] == two[:k - 2]:
-                    candidate_list.append(freq_sets[i] | freq_sets[j]) # if they match union them
+    return candidate_list
 
 
-    ## CANDIDATE LIST PRUNING
-    remove = []  #list of candidates to prune
+def freq_levels(freq_sets):
+    """Groups frequent itemsets by size into the list-of-levels F of apriori.
 
-    #print(freq_sets)
-    #print(candidate_list)
+    Every level is sorted, and F ends with an empty level just like the
+    level-wise loop in apriori, so len(F) means the same for every miner.
 
-    for new_set in candidate_list:
-        unfrozenset = set(new_set)
-        #print(list(unfrozenset))
-        for item in list(unfrozenset):  # for each cadidate. remove one item from the set at a time
-            unfrozenset.discard(item)
+    Parameters
+    ----------
+    freq_sets : iterable
+        The frequent itemsets (frozensets) in any order.
 
-            #print(unfrozenset)
+    Returns
+    -------
+    F : list
+        F[k-1] is the list of frequent k-itemsets.
+    """
+    F = [[]]
+    for itemset in freq_sets:
+        while len(F) <= len(itemset):
+            F.append([])
+        F[len(itemset) - 1].append(itemset)
+    for kset in F:
+        kset.sort(key=sorted)
+    if F[-1]:
+        F.append([])
+    return F
+
+
+class FPNode(object):
+    """A node of an FP-tree.
+
+    Nodes that hold the same item are found through the header table of the
+    tree, so a node only keeps its count, its parent and its children.
+    """
 
-            if unfrozenset not in freq_sets:  #if the new subeset is not frequent
-                #print(candidate_list)
-                #print(new_set)
-                #print('found')
-                if new_set in candidate_list:  #prune it from the candidate list
-                    remove.append(new_set)
-            unfrozenset.add(item)
+    def __init__(self, item, parent):
+        self.item = item
+        self.count = 0
+        self.parent = parent
+        self.children = {}
 
-    for item in remove:
-        candidate_list.remove(item) #remove all items from the list
 
+def build_fptree(transactions, min_sup):
+    """Builds an FP-tree in two passes over weighted transactions.
 
-    return candidate_list
+    The first pass counts every item. The second pass inserts the frequent
+    items of each transaction, in descending support order, as a path from
+    the root so that transactions sharing a prefix share nodes.
 
+    Parameters
+    ----------
+    transactions : list
+        A list of (items, count) pairs.
 
-def loadDataSet(fileName, delim=','):
-    fr = open(fileName)
-    stringArr = [line.strip().split(delim) for line in fr.readlines()]
-    return stringArr
+    min_sup : float
+        The minimum support count.
 
+    Returns
+    -------
+    header : dict
+        Maps each frequent item to the list of tree nodes holding it.
 
+    item_count : dict
+        The support count of every item seen in the first pass.
+    """
+    item_count = {}
+    for items, count in transactions:
+        for item in items:
+            item_count[item] = item_count.get(item, 0) + count
+
+    rank = {}
+    for item in sorted(item_count, key=lambda i: (-item_count[i], i)):
+        if item_count[item] >= min_sup:
+            rank[item] = len(rank)
+
+    root = FPNode(None, None)
+    header = dict((item, []) for item in rank)
+    for items, count in transactions:
+        node = root
+        for item in sorted((i for i in items if i in rank), key=rank.get):
+            child = node.children.get(item)
+            if child is None:
+                child = FPNode(item, node)
+                node.children[item] = child
+                header[item].append(child)
+            child.count += count
+            node = child
+
+    return header, item_count
+
+
+def mine_fptree(header, suffix, min_sup, support_data):
+    """Recursively mines an FP-tree through conditional pattern bases.
+
+    For every item of the tree, suffix + item is frequent. Its conditional
+    pattern base (the prefix paths above the item's nodes, weighted by the
+    node counts) is built into a conditional FP-tree and mined in turn, so
+    no candidate itemset is ever generated.
 
-def run_apriori(data_path, min_support, verbose=False):
-    dataset = loadDataSet(data_path)
-    F, support = apriori(dataset, min_support=min_support, verbose=verbose)
-    return F, support
+    Parameters
+    ----------
+    header : dict
+        The header table returned by build_fptree.
 
+    suffix : frozenset
+        The itemset the tree is conditioned on.
 
+    min_sup : float
+        The minimum support count.
 
-def bool_transfer(input):
-    ''' Transfer the input to boolean type'''
-    input = str(input)
-    if input.lower() in ['t', '1', 'true' ]:
-        return True
-    elif input.lower() in ['f', '0', 'false']:
-        return False
-    else:
-        raise ValueError('Input must be one of {T, t, 1, True, true, F, F, 0, False, false}')
+    support_data : dict
+        Updated in place with the support count of every frequent itemset.
+    """
+    for item, nodes in header.items():
+        itemset = suffix | frozenset([item])
+        support_data[itemset] = sum(node.count for node in nodes)
 
+        pattern_base = []
+        for node in nodes:
+            path = []
+            parent = node.parent
+            while parent.item is not None:
+                path.append(parent.item)
+                parent = parent.parent
+            if path:
+                pattern_base.append((path, node.count))
 
+        cond_header = build_fptree(pattern_base, min_sup)[0]
+        if cond_header:
+            mine_fptree(cond_header, itemset, min_sup, support_data)
 
 
-if __name__ == '__main__':
-    if len(sys.argv)==3:
-        F, support = run_apriori(sys.argv[1], float(sys.argv[2]))
-    elif len(sys.argv)==4:
-        F, support = run_apriori(sys.argv[1], float(sys.argv[2]), bool_transfer(sys.argv[3]))
-    else:
-        raise ValueError('Usage: python apriori_templete.py <data_path> <min_support> <is_verbose>')
-    print(len(F))
-    print(len(support))
+def fpgrowth(dataset, min_support=0.5, verbose=False):
+    """Implements the FP-Growth algorithm.
 
-    '''
-    Example:
+    Mines the same frequent itemsets as apriori, but compresses the dataset
+    into an FP-tree and grows patterns from conditional trees instead of
+    generating and counting candidates level by level.
 
-    python apriori_templete.py market_data_transaction.txt 0.5
+    Parameters
+    ----------
+    dataset : list
+        The dataset (a list of transactions).
 
-    python apriori_templete.py market_data_transaction.txt 0.5 True
+    min_support : float
+        The minimum support threshold. Defaults to 0.5.
+
+    Returns
+    -------
+    F : list
+        The list of frequent itemsets.
+
+    support_data : dict
+        The support data of every 1-itemset and of every frequent itemset.
+        Infrequent k-itemsets (k > 1) are never generated, so unlike apriori
+        they have no entry.
+
+    References
+    ----------
+    .. [1] J. Han, J. Pei, Y. Yin, "Mining Frequent Patterns without
+           Candidate Generation", 2000.
+
+    """
+    items, indptr, indices = encode_dataset(dataset)
+    transactions = [(transaction, 1) for transaction in iter_transactions(indptr, indices)]
+    min_sup = len(transactions) * min_support
+
+    header, item_count = build_fptree(transactions, min_sup)
+    support_data = dict((frozenset([item]), count) for item, count in item_count.items())
+    mine_fptree(header, frozenset(), min_sup, support_data)
+
+    F = freq_levels(itemset for itemset, support in support_data.items()
+                    if support >= min_sup)
+    F, support_data = decode_freq(F, support_data, items)
+
+    if verbose:
+        print_freq(F, support_data)
+
+    return F, support_data
+
+
+def build_tidsets(dataset):
+    """Encodes a dataset and builds its vertical layout.
+
+    Returns
+    -------
+    items : list
+        The item of every id, as returned by encode_dataset.
+
+    tidsets : dict
+        Maps every item id to the set of ids of the transactions holding it.
+    """
+    items, indptr, indices = encode_dataset(dataset)
+    tidsets = {}
+    for tid, transaction in enumerate(iter_transactions(indptr, indices)):
+        for item in transaction:
+            tidsets.setdefault(item, set()).add(tid)
+    return items, tidsets
+
+
+def mine_eclat(prefix, klass, min_sup, support_data, diffsets):
+    """Depth-first search over one prefix equivalence class.
+
+    Every member of the class extends prefix by one item. Joining a member
+    with each member after it gives the class of the longer prefix, which
+    is mined before moving on, so only one class per depth is alive.
+
+    With tidsets, t(PXY) = t(PX) & t(PY). With diffsets, d(PXY) = d(PY) -
+    d(PX) and sup(PXY) = sup(PX) - |d(PXY)|; the first join from tidsets
+    uses d(PXY) = t(PX) - t(PY) instead.
+
+    Parameters
+    ----------
+    prefix : frozenset
+        The itemset shared by every member of the class.
+
+    klass : list
+        (item, tids, support) triples, where tids is a tidset or, once
+        diffsets are in use, a diffset.
+
+    min_sup : float
+        The minimum support count.
+
+    support_data : dict
+        Updated in place with the support count of every frequent itemset.
+
+    diffsets : int
+        0 to intersect tidsets, 1 to switch to diffsets at this level and
+        2 if the members of klass already hold diffsets.
+    """
+    for i, (item, x, sup) in enumerate(klass):
+        itemset = prefix | frozenset([item])
+        support_data[itemset] = sup
+
+        suffix_class = []
+        for item_j, y, sup_j in klass[i + 1:]:
+            if diffsets == 0:
+                tids = x & y
+                support = len(tids)
+            else:
+                tids = x - y if diffsets == 1 else y - x
+                support = sup - len(tids)
+            if support >= min_sup:
+                suffix_class.append((item_j, tids, support))
+
+        if suffix_class:
+            mine_eclat(itemset, suffix_class, min_sup, support_data, 2 if diffsets else 0)
+
+
+def eclat(dataset, min_support=0.5, verbose=False, mode='auto'):
+    """Implements the Eclat / dEclat algorithms.
+
+    Mines the same frequent itemsets as apriori on the vertical layout of
+    the dataset: each item keeps the set of transaction ids (tidset) that
+    contain it, and itemsets are grown depth-first within prefix
+    equivalence classes. Memory is bounded by the search depth rather than
+    by a whole level of candidates.
+
+    Parameters
+    ----------
+    dataset : list
+        The dataset (a list of transactions), as returned by loadDataSet.
+
+    min_support : float
+        The minimum support threshold. Defaults to 0.5.
+
+    mode : str
+        'tidset' intersects tidsets (Eclat), 'diffset' carries the
+        differences from the parent tidset instead (dEclat). 'auto' (the
+        default) picks diffsets when the frequent items cover at least half
+        of the transactions on average, where diffsets are the smaller of
+        the two.
+
+    Returns
+    -------
+    F : list
+        The list of frequent itemsets.
+
+    support_data : dict
+        The support data of every 1-itemset and of every frequent itemset.
+
+    References
+    ----------
+    .. [1] M. J. Zaki, K. Gouda, "Fast Vertical Mining Using Diffsets",
+           2003.
+
+    """
+    items, tidsets = build_tidsets(dataset)
+    min_sup = len(dataset) * min_support
+
+    support_data = dict((frozenset([item]), len(tids)) for item, tids in tidsets.items())
+    klass = sorted(((item, tids, len(tids)) for item, tids in tidsets.items()
+                    if len(tids) >= min_sup), key=lambda m: (m[2], m[0]))
+
+    if mode == 'auto':
+        density = sum(m[2] for m in klass) / float(max(len(klass), 1) * max(len(dataset), 1))
+        mode = 'diffset' if density >= 0.5 else 'tidset'
+    if mode not in ('tidset', 'diffset'):
+        raise ValueError("mode must be one of {'auto', 'tidset', 'diffset'}")
+
+    mine_eclat(frozenset(), klass, min_sup, support_data, 1 if mode == 'diffset' else 0)
+
+    F = freq_levels(itemset for itemset, support in support_data.items()
+                    if support >= min_sup)
+    F, support_data = decode_freq(F, support_data, items)
+
+    if verbose:
+        print_freq(F, support_data)
+
+    return F, support_data
+
+
+def mine_charm(klass, min_sup, closed):
+    """Depth-first CHARM search over one class of (itemset, tidset) pairs.
+
+    Joining X with a later member Y of the class is pruned by comparing
+    tidsets: when t(X) is contained in t(Y), Y is merged into X itself,
+    since every transaction with X also has Y; when t(Y) is contained in
+    t(X), Y is only kept as an extension of X and dropped from the class.
+    Non-closed itemsets are therefore mostly never generated, and those
+    that are get caught by the subsumption check before being kept.
+
+    Parameters
+    ----------
+    klass : list
+        [itemset, tidset] pairs sharing the same prefix, ordered by
+        increasing support.
+
+    min_sup : float
+        The minimum support count.
+
+    closed : dict
+        Updated in place. Maps (support, sum of tids) to the closed
+        itemsets found with that key, since a subsuming itemset must have
+        the same tidset.
+    """
+    i = 0
+    while i < len(klass):
+        X, tX = klass[i]
+        extensions = []
+        j = i + 1
+        while j < len(klass):
+            Y, tY = klass[j]
+            tXY = tX & tY
+            if len(tXY) < min_sup:
+                j += 1
+            elif len(tXY) == len(tX) == len(tY):
+                X = X | Y
+                del klass[j]
+            elif len(tXY) == len(tX):
+                X = X | Y
+                j += 1
+            elif len(tXY) == len(tY):
+                extensions.append((Y, tXY))
+                del klass[j]
+            else:
+                extensions.append((Y, tXY))
+                j += 1
+
+        if extensions:
+            suffix_class = sorted(([X | Y, tXY] for Y, tXY in extensions), key=lambda m: len(m[1]))
+            mine_charm(suffix_class, min_sup, closed)
+
+        key = (len(tX), sum(tX))
+        if not any(X <= Z for Z in closed.get(key, ())):
+            closed.setdefault(key, []).append(X)
+        i += 1
+
+
+def charm(dataset, min_support=0.5, verbose=False):
+    """Mines the closed frequent itemsets with the CHARM algorithm.
+
+    A frequent itemset is closed when no superset has the same support.
+    The closed itemsets and their supports determine the support of every
+    frequent itemset: it is the largest support of a closed superset.
+    At low min_support they are far fewer than all frequent itemsets.
+
+    Parameters
+    ----------
+    dataset : list
+        The dataset (a list of transactions).
+
+    min_support : float
+        The minimum support threshold. Defaults to 0.5.
+
+    Returns
+    -------
+    F : list
+        The list of closed frequent itemsets.
+
+    support_data : dict
+        The support data of the closed frequent itemsets.
+
+    References
+    ----------
+    .. [1] M. J. Zaki, C.-J. Hsiao, "CHARM: An Efficient Algorithm for
+           Closed Itemset Mining", 2002.
+
+    """
+    items, tidsets = build_tidsets(dataset)
+    min_sup = len(dataset) * min_support
+
+    klass = sorted(([frozenset([item]), tids] for item, tids in tidsets.items()
+                    if len(tids) >= min_sup), key=lambda m: (len(m[1]), min(m[0])))
+    closed = {}
+    mine_charm(klass, min_sup, closed)
+
+    support_data = dict((itemset, key[0]) for key, itemsets in closed.items()
+                        for itemset in itemsets)
+    F, support_data = decode_freq(freq_levels(support_data), support_data, items)
+
+    if verbose:
+        print_freq(F, support_data)
+
+    return F, support_data
+
+
+def mine_maximal(head, tail, min_sup, maximal, index):
+    """Depth-first MaxMiner-style search for maximal frequent itemsets.
+
+    Before expanding head, the look-ahead checks whether head together with
+    its whole tail is frequent. If so, that itemset is the only maximal
+    candidate in the subtree, and nothing below head is visited. A subtree
+    is skipped as well when head plus tail is already contained in a
+    maximal itemset found earlier.
+
+    Parameters
+    ----------
+    head : frozenset
+        The itemset at this node of the search.
+
+    tail : list
+        (item, tidset of head | item) pairs of the frequent extensions of
+        head, in search order.
+
+    min_sup : float
+        The minimum support count.
+
+    maximal : list
+        Updated in place with (itemset, support) for every maximal itemset.
+
+    index : dict
+        Maps every item to the positions in maximal of the itemsets holding
+        it, for the subsumption checks.
+    """
+    def subsumed(itemset):
+        holders = None
+        for item in itemset:
+            holders = index.get(item, set()) if holders is None else holders & index.get(item, set())
+            if not holders:
+                return False
+        return True
+
+    def insert(itemset, support):
+        if not subsumed(itemset):
+            for item in itemset:
+                index.setdefault(item, set()).add(len(maximal))
+            maximal.append((itemset, support))
+
+    hut = head.union(item for item, tids in tail)
+    if subsumed(hut):
+        return
+
+    tids = set.intersection(*[tids for item, tids in tail])
+    if len(tids) >= min_sup:
+        insert(hut, len(tids))
+        return
+
+    for i, (item, tX) in enumerate(tail):
+        new_head = head | frozenset([item])
+        new_tail = []
+        for item_j, tY in tail[i + 1:]:
+            tXY = tX & tY
+            if len(tXY) >= min_sup:
+                new_tail.append((item_j, tXY))
+        if new_tail:
+            mine_maximal(new_head, new_tail, min_sup, maximal, index)
+        else:
+            insert(new_head, len(tX))
+
+
+def maxminer(dataset, min_support=0.5, verbose=False):
+    """Mines the maximal frequent itemsets.
+
+    A frequent itemset is maximal when no superset is frequent. Every
+    frequent itemset is a subset of a maximal one, so they describe the
+    same patterns (but not their supports) with far fewer itemsets. Items
+    are searched in increasing support order so that the look-ahead of
+    mine_maximal succeeds as early as possible.
+
+    Parameters
+    ----------
+    dataset : list
+        The dataset (a list of transactions).
+
+    min_support : float
+        The minimum support threshold. Defaults to 0.5.
+
+    Returns
+    -------
+    F : list
+        The list of maximal frequent itemsets.
+
+    support_data : dict
+        The support data of the maximal frequent itemsets.
+
+    References
+    ----------
+    .. [1] R. J. Bayardo, "Efficiently Mining Long Patterns from
+           Databases", 1998.
+
+    """
+    items, tidsets = build_tidsets(dataset)
+    min_sup = len(dataset) * min_support
+
+    tail = sorted(((item, tids) for item, tids in tidsets.items()
+                   if len(tids) >= min_sup), key=lambda m: (len(m[1]), m[0]))
+    maximal = []
+    if tail:
+        mine_maximal(frozenset(), tail, min_sup, maximal, {})
+
+    support_data = dict(maximal)
+    F, support_data = decode_freq(freq_levels(support_data), support_data, items)
+
+    if verbose:
+        print_freq(F, support_data)
+
+    return F, support_data
+
+
+def mine_topk(tidsets, k, min_size, min_sup):
+    """Best-first search for the k most frequent itemsets.
+
+    Itemsets are enumerated as sorted tuples of positions in tidsets, and
+    a frontier queue always expands the most frequent itemset next. An
+    itemset is only generated from its prefix, which is at least as
+    frequent, so itemsets leave the queue in decreasing support order and
+    the first k of at least min_size items are the answer.
+
+    A bounded heap keeps the supports of the k best itemsets of at least
+    min_size items generated so far. Once it is full, its smallest entry is
+    the support threshold: an itemset below it can neither be in the
+    answer nor have a superset that is, so it is never queued.
+
+    Parameters
+    ----------
+    tidsets : list
+        (item, tidset) pairs; the position of an item in this list is its
+        rank when itemsets of equal support are ordered.
+
+    k : int
+        The number of itemsets to find.
+
+    min_size : int
+        The minimum number of items of a reported itemset.
+
+    min_sup : float
+        A lower bound on the support threshold.
+
+    Returns
+    -------
+    support_data : dict
+        The support count of each of the k itemsets, keyed by item ids.
+    """
+    threshold = min_sup
+    best = []  # bounded min-heap of the k best supports queued so far
+    frontier = []
+
+    def push(positions, tids):
+        if len(tids) < threshold:
+            return threshold
+        heapq.heappush(frontier, (-len(tids), positions, tids))
+        if len(positions) >= min_size:
+            heapq.heappush(best, len(tids))
+            if len(best) > k:
+                heapq.heappop(best)
+            if len(best) == k:
+                return max(threshold, best[0])
+        return threshold
+
+    for pos, (item, tids) in enumerate(tidsets):
+        threshold = push((pos,), tids)
+
+    support_data = {}
+    while frontier and len(support_data) < k:
+        support, positions, tX = heapq.heappop(frontier)
+        if len(positions) >= min_size:
+            support_data[frozenset(tidsets[pos][0] for pos in positions)] = -support
+        for pos in range(positions[-1] + 1, len(tidsets)):
+            threshold = push(positions + (pos,), tX & tidsets[pos][1])
+
+    return support_data
+
+
+def topk(dataset, k=10, min_size=1, min_support=0, verbose=False):
+    """Mines the k most frequent itemsets without a min_support guess.
+
+    The support threshold starts at min_support (or a single transaction)
+    and is raised on the fly by mine_topk as its bounded heap fills up.
+    Itemsets with equal support are ranked by their items, most frequent
+    items first, so the result does not depend on the search order.
+
+    Parameters
+    ----------
+    dataset : list
+        The dataset (a list of transactions).
+
+    k : int
+        The number of itemsets to return. Defaults to 10.
+
+    min_size : int
+        The minimum number of items of a returned itemset. Defaults to 1.
+
+    min_support : float
+        An optional lower bound on the support threshold. Defaults to 0.
+
+    Returns
+    -------
+    F : list
+        The list of the k most frequent itemsets (fewer if fewer exist).
+
+    support_data : dict
+        The support data of those itemsets.
+
+    References
+    ----------
+    .. [1] J. Han, J. Wang, Y. Lu, P. Tzvetkov, "Mining Top-K Frequent
+           Closed Patterns without Minimum Support", 2002.
+
+    """
+    items, tidsets = build_tidsets(dataset)
+    min_sup = max(len(dataset) * min_support, 1)
+
+    tidsets = sorted(tidsets.items(), key=lambda m: (-len(m[1]), m[0]))
+    support_data = mine_topk(tidsets, k, min_size, min_sup) if k > 0 else {}
+    F, support_data = decode_freq(freq_levels(support_data), support_data, items)
+
+    if verbose:
+        print_freq(F, support_data)
+
+    return F, support_data
+
+
+def generate_rules(F, support_data, min_confidence=0.7, n_transactions=None, verbose=False):
+    """Generates association rules from frequent itemsets.
+
+    Only support_data is consulted, never the transactions: every subset of
+    a frequent itemset is frequent, so its support is already known.
+    Consequents are grown level by level with apriori_gen from the
+    consequents that passed. Moving items from the antecedent to the
+    consequent can only lower the confidence, so a consequent that failed
+    is never extended.
+
+    Parameters
+    ----------
+    F : list
+        The list of frequent itemsets.
+
+    support_data : dict
+        The support data returned alongside F.
+
+    min_confidence : float
+        The minimum confidence threshold. Defaults to 0.7.
+
+    n_transactions : int
+        The number of transactions F was mined from. Lift needs it; without
+        it lift is reported as None.
+
+    Returns
+    -------
+    rules : list
+        (antecedent, consequent, support, confidence, lift) tuples, where
+        support is the support count of antecedent | consequent.
+
+    References
+    ----------
+    .. [1] R. Agrawal, R. Srikant, "Fast Algorithms for Mining Association
+           Rules", 1994.
+
+    """
+    rules = []
+    for kset in F[1:]:
+        for itemset in kset:
+            support = support_data[itemset]
+            consequents = [frozenset([item]) for item in itemset]
+            m = 1
+            while consequents and m < len(itemset):
+                passed = []
+                for consequent in consequents:
+                    antecedent = itemset - consequent
+                    confidence = support / float(support_data[antecedent])
+                    if confidence >= min_confidence:
+                        lift = None
+                        if n_transactions:
+                            lift = confidence * n_transactions / float(support_data[consequent])
+                        rules.append((antecedent, consequent, support, confidence, lift))
+                        passed.append(consequent)
+                m += 1
+                consequents = apriori_gen(passed, m) if len(passed) > 1 else []
+
+    if verbose:
+        for antecedent, consequent, support, confidence, lift in rules:
+            print("{" + ", ".join(map(str, sorted(antecedent))) + "} --> "
+                  + "{" + ", ".join(map(str, sorted(consequent))) + "}"
+                  + ":  sup = " + str(support)
+                  + ", conf = " + str(round(confidence, 3))
+                  + ("" if lift is None else ", lift = " + str(round(lift, 3))))
+
+    return rules
+
+
+def loadDataSet(fileName, delim=','):
+    fr = open(fileName)
+    stringArr = [line.strip().split(delim) for line in fr.readlines()]
+    return stringArr
+
+
+
+def iter_partitions(fileName, partition_size, delim=','):
+    """Streams a transaction file as lists of at most partition_size
+    transactions, parsed the same way as loadDataSet."""
+    with open(fileName) as fr:
+        partition = []
+        for line in fr:
+            partition.append(line.strip().split(delim))
+            if len(partition) == partition_size:
+                yield partition
+                partition = []
+        if partition:
+            yield partition
+
+
+def count_candidates(dataset, candidates):
+    """Counts the support of every candidate itemset in dataset.
+
+    Parameters
+    ----------
+    dataset : list
+        The dataset (a list of transactions).
+
+    candidates : list
+        The candidate itemsets (frozensets).
+
+    Returns
+    -------
+    support_data : dict
+        The support count of every candidate in dataset.
+    """
+    D = list(map(set, dataset))
+    return get_freq_bitset(build_bitsets(D), len(D), candidates, 0)[1]
+
+
+def count_file(data_path, candidates, partition_size=10000, delim=','):
+    """Counts candidate itemsets over a transaction file in one streaming pass.
+
+    Parameters
+    ----------
+    data_path : str
+        The transaction file.
+
+    candidates : iterable
+        The candidate itemsets (frozensets).
+
+    partition_size : int
+        The number of transactions held in memory at a time.
+
+    Returns
+    -------
+    counts : dict
+        The support count of every candidate and of every single item.
+
+    n_transactions : int
+        The number of transactions in the file.
+    """
+    candidates = [itemset for itemset in candidates if len(itemset) > 1]
+    counts = dict.fromkeys(candidates, 0)
+    n_transactions = 0
+    for partition in iter_partitions(data_path, partition_size, delim):
+        n_transactions += len(partition)
+        for transaction in partition:
+            for item in set(transaction):
+                itemset = frozenset([item])
+                counts[itemset] = counts.get(itemset, 0) + 1
+        if candidates:
+            for itemset, support in count_candidates(partition, candidates).items():
+                counts[itemset] += support
+    return counts, n_transactions
+
+
+def replay_apriori(counts, min_sup, count_missing=None):
+    """Runs the level-wise loop of apriori on known support counts.
+
+    counts must hold every single item. When it also holds every candidate
+    apriori_gen produces along the way, F and support_data come out exactly
+    as apriori returns them without scanning any transaction. Otherwise
+    count_missing is called with the uncounted candidates of a level and
+    must return their counts.
+    """
+    C1 = sorted((itemset for itemset in counts if len(itemset) == 1), key=sorted)
+    support_data = dict((itemset, counts[itemset]) for itemset in C1)
+    F = [[itemset for itemset in C1 if counts[itemset] >= min_sup]]
+    k = 2
+    while (len(F[k - 2]) > 0):
+        Ck = apriori_gen(F[k - 2], k)
+        missing = [itemset for itemset in Ck if itemset not in counts]
+        if missing:
+            counts.update(count_missing(missing))
+        support_data.update((itemset, counts[itemset]) for itemset in Ck)
+        F.append([itemset for itemset in Ck if counts[itemset] >= min_sup])
+        k += 1
+    return F, support_data
+
+
+def son(data_path, min_support=0.5, partition_size=10000, verbose=False, algorithm='apriori', delim=','):
+    """Implements the partitioned (SON) Apriori algorithm for large files.
+
+    The transaction file is streamed twice, one partition at a time, so
+    only one partition is ever held in memory:
+    (1) Mine every partition at min_support. An itemset frequent in the
+        whole file is frequent in at least one partition, so the union of
+        the locally frequent itemsets contains every frequent itemset.
+    (2) Count the global support of that union, and of the candidates
+        apriori_gen builds from it, to recover F and the support data of
+        every candidate apriori itself would have counted.
+
+    Parameters
+    ----------
+    data_path : str
+        The transaction file.
+
+    min_support : float
+        The minimum support threshold. Defaults to 0.5.
+
+    partition_size : int
+        The number of transactions per partition. Defaults to 10000. Very
+        small partitions make the local support count tiny, so far more
+        itemsets are locally frequent.
+
+    algorithm : str
+        The miner used on each partition, as in run_apriori.
+
+    Returns
+    -------
+    F : list
+        The list of frequent itemsets, exactly as apriori returns it.
+
+    support_data : dict
+        The support data for all candidate itemsets, exactly as apriori
+        returns it.
+
+    References
+    ----------
+    .. [1] A. Savasere, E. Omiecinski, S. Navathe, "An Efficient Algorithm
+           for Mining Association Rules in Large Databases", 1995.
+
+    """
+    # Pass 1: locally frequent itemsets of every partition. Only these
+    # seed the candidates; count_file counts every single item anyway.
+    local_freq = set()
+    for partition in iter_partitions(data_path, partition_size, delim):
+        for kset in mine(partition, min_support, algorithm=algorithm)[0]:
+            local_freq.update(kset)
+
+    # every candidate apriori could count, since the global F is a subset
+    # of the local ones
+    U = freq_levels(local_freq)
+    candidates = set(local_freq)
+    for k in range(2, len(U) + 1):
+        candidates.update(apriori_gen(U[k - 2], k))
+    candidates = list(candidates)
+
+    # Pass 2: global support of the candidates
+    counts, n_transactions = count_file(data_path, candidates, partition_size, delim)
+    F, support_data = replay_apriori(counts, n_transactions * min_support)
+
+    if verbose:
+        print_freq(F, support_data)
+
+    return F, support_data
+
+
+def sample_file(data_path, sample_size, seed=None, delim=','):
+    """Draws a uniform random sample of transactions from a file.
+
+    Reservoir sampling reads the file once, keeping only sample_size lines,
+    and parses only the lines that end up in the sample.
+    """
+    rng = random.Random(seed)
+    reservoir = []
+    with open(data_path) as fr:
+        for i, line in enumerate(fr):
+            if i < sample_size:
+                reservoir.append(line)
+            else:
+                j = rng.randint(0, i)
+                if j < sample_size:
+                    reservoir[j] = line
+    return [line.strip().split(delim) for line in reservoir]
+
+
+def negative_border(freq_sets):
+    """The minimal itemsets that are not in freq_sets but whose every
+    proper subset is; single items are left to the caller."""
+    levels = freq_levels(freq_sets)
+    border = []
+    for k in range(2, len(levels) + 1):
+        border.extend(itemset for itemset in apriori_gen(levels[k - 2], k)
+                      if itemset not in freq_sets)
+    return border
+
+
+def toivonen(data_path, min_support=0.5, sample_size=10000, sample_support=None, seed=None, verbose=False, partition_size=10000, delim=','):
+    """Implements Toivonen's sampling algorithm.
+
+    A random sample is mined at a lowered threshold, and the itemsets found
+    plus their negative border are counted over the whole file in a single
+    streaming pass. If nothing in the negative border turns out to be
+    frequent, every frequent itemset was among the counted ones and the
+    result is exact. Otherwise the level-wise loop of apriori is replayed
+    on the counts of the first pass, with one more pass over the file for
+    each level that has candidates the first pass did not count.
+
+    Parameters
+    ----------
+    data_path : str
+        The transaction file.
+
+    min_support : float
+        The minimum support threshold. Defaults to 0.5.
+
+    sample_size : int
+        The number of sampled transactions. Defaults to 10000.
+
+    sample_support : float
+        The threshold used on the sample. Defaults to 0.8 * min_support; a
+        lower value makes a second pass less likely but counts more.
+
+    seed : int
+        The seed of the sampler.
+
+    Returns
+    -------
+    F : list
+        The list of frequent itemsets, exactly as apriori returns it.
+
+    support_data : dict
+        The support data for all candidate itemsets, exactly as apriori
+        returns it.
+
+    References
+    ----------
+    .. [1] H. Toivonen, "Sampling Large Databases for Association Rules",
+           1996.
+
+    """
+    if sample_support is None:
+        sample_support = 0.8 * min_support
+
+    sample = sample_file(data_path, sample_size, seed, delim)
+    sample_freq = set(itemset for kset in apriori(sample, sample_support)[0] for itemset in kset)
+    border = negative_border(sample_freq)
+
+    # Pass 1: the sample's frequent itemsets, their border and all items
+    counts, n_transactions = count_file(data_path, sample_freq.union(border), partition_size, delim)
+    min_sup = n_transactions * min_support
+
+    missed = [itemset for itemset in border if counts[itemset] >= min_sup]
+    missed += [itemset for itemset, support in counts.items()
+               if len(itemset) == 1 and support >= min_sup and itemset not in sample_freq]
+    if missed and verbose:
+        print("negative border check failed on %d itemsets" % len(missed))
+
+    # with an empty miss list, every candidate is already counted
+    F, support_data = replay_apriori(
+        counts, min_sup,
+        lambda candidates: count_file(data_path, candidates, partition_size, delim)[0])
+
+    if verbose:
+        print_freq(F, support_data)
+
+    return F, support_data
+
+
+def fup(support_data, n_transactions, new_dataset, old_data_path, min_support=0.5, verbose=False, partition_size=10000, delim=','):
+    """Updates a previous mining result after transactions are appended.
+
+    Replays the level-wise loop of apriori on old + new transactions
+    without mining the old ones again. The support of a candidate is its
+    count in the new transactions plus its old count, which is read from
+    the previous support_data when the old run already counted it. Only
+    candidates the old run never counted are looked up in the old file,
+    in one streaming pass per level, and candidates with an item absent
+    from the old data are known to have an old count of 0.
+
+    The previous F is not needed: every previously frequent itemset is
+    in support_data with its count.
+
+    Parameters
+    ----------
+    support_data : dict
+        The support data of the previous run.
+
+    n_transactions : int
+        The number of transactions the previous run was mined from.
+
+    new_dataset : list
+        The appended transactions.
+
+    old_data_path : str
+        The transaction file of the previous run, excluding new_dataset.
+
+    min_support : float
+        The minimum support threshold. Defaults to 0.5.
+
+    Returns
+    -------
+    F : list
+        The list of frequent itemsets, exactly as apriori returns it on all
+        n_transactions + len(new_dataset) transactions.
+
+    support_data : dict
+        The support data for all candidate itemsets, exactly as apriori
+        returns it on all transactions.
+
+    References
+    ----------
+    .. [1] D. W. Cheung, J. Han, V. T. Ng, C. Y. Wong, "Maintenance of
+           Discovered Association Rules in Large Databases: An Incremental
+           Updating Technique", 1996.
+
+    """
+    old_items = set(item for itemset in support_data if len(itemset) == 1 for item in itemset)
+    D = list(map(set, new_dataset))
+    bitsets = build_bitsets(D)
+    min_sup = (n_transactions + len(D)) * min_support
+
+    def count(candidates):
+        counts = get_freq_bitset(bitsets, len(D), candidates, 0)[1]
+        rescan = []
+        for cand in candidates:
+            if cand in support_data:
+                counts[cand] += support_data[cand]
+            elif cand <= old_items:
+                rescan.append(cand)
+        if rescan:
+            for partition in iter_partitions(old_data_path, partition_size, delim):
+                for cand, support in count_candidates(partition, rescan).items():
+                    counts[cand] += support
+        return [cand for cand in candidates if counts[cand] >= min_sup], counts
+
+    C1 = [frozenset([item]) for item in sorted(old_items.union(*D))]
+    F1, new_support_data = count(C1)
+    F = [F1]
+    k = 2
+    while (len(F[k - 2]) > 0):
+        Ck = apriori_gen(F[k - 2], k)
+        Fk, supK = count(Ck)
+        new_support_data.update(supK)
+        F.append(Fk)
+        k += 1
+
+    if verbose:
+        print_freq(F, new_support_data)
+
+    return F, new_support_data
+
+
+def save_state(fileName, support_data, n_transactions):
+    """Saves a mining result so fup can update it later."""
+    with open(fileName, 'wb') as fw:
+        pickle.dump((support_data, n_transactions), fw)
+
+
+def load_state(fileName):
+    """Loads the (support_data, n_transactions) saved by save_state."""
+    with open(fileName, 'rb') as fr:
+        return pickle.load(fr)
+
+
+def mine(dataset, min_support, verbose=False, counter='subset', algorithm='apriori', n_jobs=1, output='all'):
+    """Mines dataset with the chosen algorithm ('apriori', 'fpgrowth' or
+    'eclat'); counter and n_jobs only apply to apriori. output='closed' or
+    'maximal' mines only the closed (charm) or maximal (maxminer) frequent
+    itemsets instead, whatever the algorithm."""
+    if output == 'closed':
+        return charm(dataset, min_support=min_support, verbose=verbose)
+    elif output == 'maximal':
+        return maxminer(dataset, min_support=min_support, verbose=verbose)
+    elif output != 'all':
+        raise ValueError("output must be one of {'all', 'closed', 'maximal'}")
+
+    if algorithm == 'apriori':
+        return apriori(dataset, min_support=min_support, verbose=verbose, counter=counter, n_jobs=n_jobs)
+    elif algorithm == 'fpgrowth':
+        return fpgrowth(dataset, min_support=min_support, verbose=verbose)
+    elif algorithm == 'eclat':
+        return eclat(dataset, min_support=min_support, verbose=verbose)
+    else:
+        raise ValueError("algorithm must be one of {'apriori', 'fpgrowth', 'eclat'}")
+
+
+
+def run_apriori(data_path, min_support, verbose=False, counter='subset', algorithm='apriori', partition_size=None, n_jobs=1, output='all', top_k=None, min_size=1, sample_size=None):
+    if top_k:
+        # min_support only bounds the threshold topk raises by itself
+        return topk(loadDataSet(data_path), top_k, min_size, min_support, verbose=verbose)
+    if sample_size:
+        return toivonen(data_path, min_support, sample_size, verbose=verbose)
+    if partition_size:
+        return son(data_path, min_support, partition_size, verbose=verbose, algorithm=algorithm)
+    dataset = loadDataSet(data_path)
+    F, support = mine(dataset, min_support, verbose=verbose, counter=counter, algorithm=algorithm, n_jobs=n_jobs, output=output)
+    return F, support
+
+
+
+def bool_transfer(input):
+    ''' Transfer the input to boolean type'''
+    input = str(input)
+    if input.lower() in ['t', '1', 'true' ]:
+        return True
+    elif input.lower() in ['f', '0', 'false']:
+        return False
+    else:
+        raise ValueError('Input must be one of {T, t, 1, True, true, F, F, 0, False, false}')
+
+
+
+
+if __name__ == '__main__':
+    if len(sys.argv)==3:
+        F, support = run_apriori(sys.argv[1], float(sys.argv[2]))
+    elif len(sys.argv)==4:
+        F, support = run_apriori(sys.argv[1], float(sys.argv[2]), bool_transfer(sys.argv[3]))
+    elif len(sys.argv)==5:
+        F, support = run_apriori(sys.argv[1], float(sys.argv[2]), bool_transfer(sys.argv[3]), algorithm=sys.argv[4])
+    else:
+        raise ValueError('Usage: python apriori_templete.py <data_path> <min_support> <is_verbose> <algorithm>')
+    print(len(F))
+    print(len(support))
+
+    '''
+    Example:
+
+    python apriori_templete.py market_data_transaction.txt 0.5
+
+    python apriori_templete.py market_data_transaction.txt 0.5 True
+
+    python apriori_templete.py gene_data_transaction.txt 0.5 False fpgrowth
 
     '''
@@ -6,9 +6,23 @@ from matplotlib import pyplot as plt
 import numpy as np
 import copy
 import csv
+import os
 
 
-def loadDataSet(fileName):      #general function to parse tab -delimited floats
+def loadDataSet(fileName, dtype=None):      #general function to parse tab -delimited floats
+    '''Parses a comma separated data file into an array
+    With dtype ('float32' or 'float64') the file is converted once into a
+    binary .npy copy next to it (see convertDataSet) and that copy is
+    memory-mapped read-only instead. A .npy fileName is mapped directly.
+    '''
+    if fileName.endswith('.npy'):
+        return np.load(fileName, mmap_mode='r')
+    if dtype is not None:
+        binFileName = '%s.%s.npy' % (os.path.splitext(fileName)[0], np.dtype(dtype).name)
+        if not os.path.exists(binFileName) or os.path.getmtime(binFileName) < os.path.getmtime(fileName):
+            convertDataSet(fileName, binFileName, dtype)
+        return np.load(binFileName, mmap_mode='r')
+
     dataMat = []                #assume last column is target value
     fr = open(fileName)
     for line in fr.readlines():
@@ -18,6 +32,32 @@ def loadDataSet(fileName):      #general function to parse tab -delimited floats
     return np.array(dataMat)
 
 
+def convertDataSet(fileName, binFileName, dtype='float32'):
+    '''Converts a comma separated data file into a contiguous .npy array
+    of the given dtype, one line at a time
+
+    Returns:
+    ------------
+    binFileName : str
+    '''
+    rows, columns = 0, 0
+    with open(fileName) as fr:
+        for line in fr:
+            if line.strip():
+                rows += 1
+                columns = len(line.split(','))
+    out = np.lib.format.open_memmap(binFileName, mode='w+', dtype=dtype, shape=(rows, columns))
+    with open(fileName) as fr:
+        row = 0
+        for line in fr:
+            if line.strip():
+                out[row] = list(map(float, line.strip().split(',')))
+                row += 1
+    out.flush()
+    del out
+    return binFileName
+
+
 def merge_cluster(distance_matrix, cluster_candidate, T):
     ''' Merge two closest clusters according to min distances
     1. Find the smallest entry in the distance matrix—suppose the entry
@@ -123,8 +163,10 @@ def agglomerative_with_min(data, cluster_number):
     for i in range(N):
         cluster_candidate[i+1] = [i]  #key: cluser id; value: point ids in the cluster
 
-    # initialize distance matrix
-    distance_matrix = np.zeros((N,N))
+    # initialize distance matrix, in the precision of the data (float32
+    # data gives a float32 matrix, half the memory)
+    dtype = data.dtype if data.dtype == np.float32 else float
+    distance_matrix = np.zeros((N,N), dtype=dtype)
     for i in range(N):
         for j in range(N):
             if j == i: # or j<=i
@@ -151,6 +193,216 @@ def agglomerative_with_min(data, cluster_number):
     return clusterAssment
 
 
+def pairwise_distances(data, squared=False, block_size=1024):
+    """
+    full N x N Euclidean distance matrix, built in row blocks from
+    ||x||^2 - 2 x.y + ||y||^2, in the precision of the data (float32 data
+    gives a float32 matrix)
+
+    Parameters:
+    ------------
+    data : 2-D array
+    squared : bool
+        return squared distances
+
+    Returns:
+    ------------
+    distance_matrix : 2-D array
+    """
+    X = np.asarray(data)
+    dtype = X.dtype if X.dtype == np.float32 else float
+    X = X.astype(dtype, copy=False)
+    norms = np.einsum('ij,ij->i', X, X)
+    distance_matrix = np.empty((len(X), len(X)), dtype=dtype)
+    for start in range(0, len(X), block_size):
+        block = distance_matrix[start:start + block_size]
+        np.dot(X[start:start + block_size], X.T, out=block)
+        block *= -2
+        block += norms[start:start + block_size, None]
+        block += norms[None, :]
+        np.maximum(block, 0, out=block)
+        if not squared:
+            np.sqrt(block, out=block)
+    return distance_matrix
+
+
+def mst_single_linkage(data):
+    """
+    single link merges from a minimum spanning tree (Prim's algorithm)
+
+    Single link clustering merges along the edges of the minimum spanning
+    tree in order of length. Prim's algorithm finds the tree in O(N^2)
+    time while computing one row of distances at a time, so it needs
+    O(N) memory instead of the N x N matrix.
+
+    Parameters:
+    ------------
+    data : 2-D array
+
+    Returns:
+    ------------
+    merges : list of tuples
+        (point_a, point_b, distance) per merge, a and b being points of
+        the two merged clusters, in the order the merges happen
+    """
+    X = np.asarray(data, dtype=float)
+    N = len(X)
+    in_tree = np.zeros(N, dtype=bool)
+    nearest = np.full(N, np.inf)
+    parent = np.zeros(N, dtype=int)
+
+    merges = []
+    current = 0
+    for step in range(N - 1):
+        in_tree[current] = True
+        diff = X - X[current]
+        distance = np.sqrt(np.einsum('ij,ij->i', diff, diff))
+        closer = (distance < nearest) & ~in_tree
+        nearest[closer] = distance[closer]
+        parent[closer] = current
+        nearest[in_tree] = np.inf
+        current = int(np.argmin(nearest))
+        merges.append((int(parent[current]), current, float(nearest[current])))
+
+    merges.sort(key=lambda merge: merge[2])
+    return merges
+
+
+def nn_chain(data, linkage='average'):
+    """
+    complete, average and Ward link merges by the nearest-neighbour chain
+
+    The chain follows nearest neighbours from an arbitrary cluster until
+    two clusters are each other's nearest neighbour, merges them and
+    continues from the rest of the chain. The distances of the merged
+    cluster come from the Lance-Williams update of the two old rows, so
+    every merge costs O(N) and the whole clustering O(N^2) time. These
+    linkages are reducible, so the merges found out of order are the
+    same as the greedy ones once sorted by distance.
+
+    Parameters:
+    ------------
+    data : 2-D array
+    linkage : str
+        'single', 'complete', 'average' or 'ward'
+
+    Returns:
+    ------------
+    merges : list of tuples
+        (point_a, point_b, distance) per merge, sorted by distance
+    """
+    if linkage not in ('single', 'complete', 'average', 'ward'):
+        raise ValueError('unknown linkage: %r' % (linkage,))
+    N = len(data)
+    # Ward's update works on squared Euclidean distances
+    distance_matrix = pairwise_distances(data, squared=linkage == 'ward')
+    np.fill_diagonal(distance_matrix, np.inf)
+    size = np.ones(N)
+    active = np.ones(N, dtype=bool)
+
+    merges = []
+    chain = []
+    while len(merges) < N - 1:
+        if not chain:
+            chain.append(int(np.argmax(active)))
+        a = chain[-1]
+        row = distance_matrix[a]
+        b = int(np.argmin(row))
+        # prefer the previous chain element on ties, so the chain cannot cycle
+        if len(chain) > 1 and row[chain[-2]] <= row[b]:
+            b = chain[-2]
+        if len(chain) == 1 or b != chain[-2]:
+            chain.append(b)
+            continue
+
+        chain = chain[:-2]
+        d_ab = row[b]
+        d_a, d_b = distance_matrix[a].astype(float), distance_matrix[b].astype(float)
+        n_a, n_b = size[a], size[b]
+        if linkage == 'single':
+            merged = np.minimum(d_a, d_b)
+        elif linkage == 'complete':
+            merged = np.maximum(d_a, d_b)
+        elif linkage == 'average':
+            merged = (n_a * d_a + n_b * d_b) / (n_a + n_b)
+        else:
+            merged = ((n_a + size) * d_a + (n_b + size) * d_b - size * d_ab) / (n_a + n_b + size)
+        merged[~active] = np.inf
+
+        # the merged cluster takes over slot b, slot a is retired
+        active[a] = False
+        merged[a] = merged[b] = np.inf
+        distance_matrix[b] = merged
+        distance_matrix[:, b] = merged
+        distance_matrix[a] = np.inf
+        distance_matrix[:, a] = np.inf
+        size[b] = n_a + n_b
+        merges.append((a, b, float(np.sqrt(d_ab)) if linkage == 'ward' else float(d_ab)))
+
+    merges.sort(key=lambda merge: merge[2])
+    return merges
+
+
+def agglomerative(data, cluster_number, linkage='single', verbose=False):
+    """
+    agglomerative clustering in O(N^2) time
+
+    Single link uses mst_single_linkage, and the other linkages use
+    nn_chain. The sorted merges are replayed with a union-find until
+    cluster_number clusters are left. Cluster ids and the final
+    numbering follow agglomerative_with_min: points start as clusters
+    1..N, the t-th merge creates cluster N+t, and the remaining clusters
+    are numbered in id order.
+
+    Parameters:
+    ------------
+    data : 2-D array
+        each row represents an observation and
+        each column represents an attribute
+
+    cluster_number : int
+        number of clusters
+
+    linkage : str
+        'single', 'complete', 'average' or 'ward'
+
+    verbose : bool
+        print every merge like agglomerative_with_min
+
+    Returns:
+    ------------
+    clusterAssment: list
+        assigned cluster id for each data point
+    """
+    N = len(data)
+    if linkage == 'single':
+        merges = mst_single_linkage(data)
+    else:
+        merges = nn_chain(data, linkage)
+
+    root = list(range(N))
+    def find(i):
+        while root[i] != i:
+            root[i] = root[root[i]]
+            i = root[i]
+        return i
+
+    cluster_id = list(range(1, N + 1))  # id of the cluster rooted at each point
+    T = N + 1
+    for i, (a, b, distance) in enumerate(merges[:max(N - cluster_number, 0)]):
+        ra, rb = find(min(a, b)), find(max(a, b))
+        if verbose:
+            print('%d-th merging: %d, %d, %d'% (i, cluster_id[ra], cluster_id[rb], T))
+        root[ra] = rb
+        cluster_id[rb] = T
+        T += 1
+
+    roots = [find(i) for i in range(N)]
+    final_ids = sorted(set(cluster_id[r] for r in roots))
+    index = dict((cid, k) for k, cid in enumerate(final_ids))
+    return [index[cluster_id[r]] for r in roots]
+
+
 def saveData(save_filename, data, clusterAssment):
     clusterAssment = np.array(clusterAssment, dtype = object)[:,None]
     data_cluster = np.concatenate((data, clusterAssment), 1)
@@ -164,17 +416,27 @@ def saveData(save_filename, data, clusterAssment):
 
 
 if __name__ == '__main__':
-    if len(sys.argv) == 3:
+    linkage = 'single'
+    if len(sys.argv) in (3, 4):
         data_filename = sys.argv[1]
         cluster_number = int(sys.argv[2])
+        if len(sys.argv) == 4:
+            linkage = sys.argv[3]
     else:
         data_filename = 'Example.csv'
         cluster_number = 1
 
-    save_filename = data_filename.replace('.csv', '_hc_cluster.csv')
+    save_filename = os.path.splitext(data_filename)[0] + '_hc_cluster.csv'
 
     data = loadDataSet(data_filename)
 
-    clusterAssment = agglomerative_with_min(data, cluster_number)
+    # same merges and output as agglomerative_with_min for single link,
+    # in O(N^2) instead of O(N^3)
+    clusterAssment = agglomerative(data, cluster_number, linkage, verbose=True)
 
     saveData(save_filename, data, clusterAssment)
+
+
+    ### Example: python Hierarchical_template.py Utilities.csv 3
+
+    ### Example: python Hierarchical_template.py YeastGene.csv 5 ward
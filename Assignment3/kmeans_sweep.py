@@ -0,0 +1,49 @@
+from __future__ import print_function
+import argparse
+import json
+
+from kmeans_template import *
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Sweep the number of clusters of kmeans_template in one run')
+    parser.add_argument('data', help='comma separated data file, or a .npy array')
+    parser.add_argument('--kmin', type=int, default=1)
+    parser.add_argument('--kmax', type=int, default=10)
+    parser.add_argument('--refs', type=int, default=10, help='reference datasets of the gap statistic, 0 to skip it')
+    parser.add_argument('--jobs', type=int, default=1, help='worker processes, -1 for one per CPU')
+    parser.add_argument('--tol', type=float, default=1e-4)
+    parser.add_argument('--max-iter', type=int, default=300)
+    parser.add_argument('--algorithm', default='lloyd', choices=['lloyd', 'elkan', 'hamerly', 'filter'])
+    parser.add_argument('--dtype', choices=['float32', 'float64'], help='memory-map a binary copy of the data')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='JSON report to write')
+    args = parser.parse_args()
+
+    data = loadDataSet(args.data, args.dtype)
+    sweep, best = kSweep(data, args.kmin, args.kmax, args.max_iter, args.tol, args.refs,
+                         args.jobs, args.seed, args.algorithm)
+
+    for run in sweep:
+        line = 'k=%-3d inertia=%-14.6g iterations=%-4d %7.3fs' % (run['k'], run['inertia'], run['iterations'], run['seconds'])
+        if run['elbow'] is not None:
+            line += '  elbow=%.6g' % run['elbow']
+        if 'gap' in run:
+            line += '  gap=%.4f+-%.4f' % (run['gap'], run['gapStd'])
+        print(line)
+    print('best k:', ', '.join('%s=%d' % item for item in sorted(best.items())))
+
+    if args.output:
+        for run in sweep:
+            run['centroids'] = run['centroids'].tolist()
+        with open(args.output, 'w') as fw:
+            json.dump({'data': args.data, 'sweep': sweep, 'best': best}, fw, indent=2)
+
+    '''
+    Example:
+
+    python kmeans_sweep.py Iris.csv --kmax 8 --output iris_sweep.json
+
+    python kmeans_sweep.py YeastGene.csv --kmin 2 --kmax 12 --refs 20 --jobs -1
+
+    '''
@@ -7,9 +7,28 @@ from matplotlib import pyplot as plt
 import numpy as np
 import copy
 import csv
+import json
+import multiprocessing
+import os
+import time
+from multiprocessing import shared_memory
 
 
-def loadDataSet(fileName):      #general function to parse tab -delimited floats
+def loadDataSet(fileName, dtype=None):      #general function to parse tab -delimited floats
+    '''Parses a comma separated data file into a matrix
+    With dtype ('float32' or 'float64') the file is converted once into a
+    binary .npy copy next to it (see convertDataSet) and that copy is
+    memory-mapped read-only instead, so repeated runs skip the parsing and
+    the data is paged in on demand. A .npy fileName is mapped directly.
+    '''
+    if fileName.endswith('.npy'):
+        return np.load(fileName, mmap_mode='r')
+    if dtype is not None:
+        binFileName = '%s.%s.npy' % (os.path.splitext(fileName)[0], np.dtype(dtype).name)
+        if not os.path.exists(binFileName) or os.path.getmtime(binFileName) < os.path.getmtime(fileName):
+            convertDataSet(fileName, binFileName, dtype)
+        return np.load(binFileName, mmap_mode='r')
+
     dataMat = []                #assume last column is target value
     fr = open(fileName)
     for line in fr.readlines():
@@ -19,6 +38,42 @@ def loadDataSet(fileName):      #general function to parse tab -delimited floats
     return mat(dataMat)
 
 
+def convertDataSet(fileName, binFileName, dtype='float32', chunkSize=10000):
+    '''Converts a comma separated data file into a contiguous .npy array
+    of the given dtype, streaming it chunk by chunk, so the CSV never has
+    to fit in memory
+    Output:
+        binFileName
+    '''
+    rows, columns = 0, None
+    for chunk in iterChunks(fileName, chunkSize):
+        rows += len(chunk)
+        columns = chunk.shape[1]
+    out = np.lib.format.open_memmap(binFileName, mode='w+', dtype=dtype, shape=(rows, columns or 0))
+    start = 0
+    for chunk in iterChunks(fileName, chunkSize):
+        out[start:start + len(chunk)] = chunk
+        start += len(chunk)
+    out.flush()
+    del out
+    return binFileName
+
+
+def floatArray(dataSet):
+    '''dataSet as a float32 or float64 array, without copying data that
+    already is one (a memory-mapped dataset stays mapped)'''
+    X = np.asarray(dataSet)
+    if X.dtype != np.float32 and X.dtype != np.float64:
+        X = X.astype(float)
+    return X
+
+
+def roundingMargin(X):
+    '''relative margin the bound tests keep over the rounding error of
+    the expanded distances of assignCluster in the dtype of X'''
+    return max(1e-10, 1000 * np.finfo(X.dtype).eps)
+
+
 def loadCenterSet(fileName):      #general function to parse tab -delimited floats
     centerMat = []                #assume last column is target value
     fr = open(fileName)
@@ -29,40 +84,191 @@ def loadCenterSet(fileName):      #general function to parse tab -delimited floa
     return mat(centerMat)
 
 
-def assignCluster(dataSet, k, centroids):
+def kMeansPlusPlus(dataSet, k, seed=None, weights=None, trials=None):
+    '''k-means++ seeding (Arthur and Vassilvitskii 2007)
+    The first centroid is a random point, every next one is a point drawn
+    with probability proportional to its squared distance to the closest
+    centroid chosen so far. Of several such draws, the one that lowers
+    the total squared distance most is kept (greedy k-means++).
+    Input:
+        dataSet: each row represents an observation and
+                 each column represents an attribute
+        k:  number of clusters
+        seed: seed of the random generator, or a RandomState
+        weights: optional weight of every point (used by kMeansParallel)
+        trials: draws per centroid, 2 + log(k) by default, 1 for plain k-means++
+    Output:
+        centroids: initial centroids
+    '''
+    rng = seed if isinstance(seed, np.random.RandomState) else np.random.RandomState(seed)
+    X = floatArray(dataSet)
+    w = np.ones(len(X)) if weights is None else np.asarray(weights, dtype=float)
+    if trials is None:
+        trials = 2 + int(np.log(k))
+
+    chosen = [rng.choice(len(X), p=w / w.sum())]
+    closest = ((X - X[chosen[0]]) ** 2).sum(axis=1)
+    for c in range(1, k):
+        p = w * closest
+        if p.sum() > 0:
+            draws = rng.choice(len(X), trials, p=p / p.sum())
+        else:
+            # fewer distinct points than k, any point will do
+            draws = rng.choice(len(X), trials, p=w / w.sum())
+        best = None
+        for index in draws:
+            update = np.minimum(closest, ((X - X[index]) ** 2).sum(axis=1))
+            cost = np.dot(w, update)
+            if best is None or cost < best[0]:
+                best = (cost, index, update)
+        chosen.append(best[1])
+        closest = best[2]
+
+    return np.matrix(X[chosen])
+
+
+def kMeansParallel(dataSet, k, seed=None, oversampling=None, rounds=5):
+    '''k-means|| seeding (Bahmani et al. 2012)
+    Starts from one random point and, in a few rounds, samples every
+    point independently with probability oversampling * d^2 / cost,
+    where d is its distance to the closest candidate. Each round is a
+    single vectorized pass, instead of the k sequential passes of
+    k-means++. The candidates are weighted by the number of points
+    closest to them and reduced to k centroids with weighted k-means++.
+    Input:
+        dataSet: each row represents an observation and
+                 each column represents an attribute
+        k:  number of clusters
+        seed: seed of the random generator
+        oversampling: expected number of candidates per round, 2k by default
+        rounds: number of sampling rounds
+    Output:
+        centroids: initial centroids
+    '''
+    rng = np.random.RandomState(seed)
+    X = floatArray(dataSet)
+    if oversampling is None:
+        oversampling = 2 * k
+
+    candidates = X[[rng.randint(len(X))]]
+    closest = ((X - candidates[0]) ** 2).sum(axis=1)
+    for r in range(rounds):
+        cost = closest.sum()
+        if cost == 0:
+            break
+        picked = rng.random_sample(len(X)) < oversampling * closest / cost
+        if not picked.any():
+            continue
+        new = X[picked]
+        candidates = np.vstack([candidates, new])
+        closest = np.minimum(closest, (pointDistances(X, new) ** 2).min(axis=1))
+
+    labels = assignCluster(X, len(candidates), candidates)
+    weights = np.bincount(labels, minlength=len(candidates))
+    if len(candidates) <= k:
+        return kMeansPlusPlus(X, k, rng)
+    return kMeansPlusPlus(candidates, k, rng, weights)
+
+
+def initCentroids(dataSet, k, method='kmeans++', seed=None):
+    '''Initial centroids without a centroid file
+    method: 'kmeans++', 'kmeans||' or 'random' (k distinct random points)
+    '''
+    if method == 'kmeans++':
+        return kMeansPlusPlus(dataSet, k, seed)
+    elif method == 'kmeans||':
+        return kMeansParallel(dataSet, k, seed)
+    elif method == 'random':
+        X = floatArray(dataSet)
+        return np.matrix(X[np.random.RandomState(seed).choice(len(X), k, replace=False)])
+    raise ValueError('unknown seeding method: %r' % (method,))
+
+
+def assignCluster(dataSet, k, centroids, blockSize=4096):
     '''For each data point, assign it to the closest centroid
     Inputs:
         dataSet: each row represents an observation and
                  each column represents an attribute
         k:  number of clusters
         centroids: initial centroids or centroids of last iteration
+        blockSize: number of rows handled per batch, which bounds the
+                   temporary distance matrix to blockSize x k
     Output:
         clusterAssment: list
             assigned cluster id for each data point
     '''
-    clusterAssment = []
+    return closestCentroids(dataSet, centroids, blockSize)[0].tolist()
+
+
+def closestCentroids(dataSet, centroids, blockSize=4096, distances=None):
+    '''assignCluster on arrays: the closest centroid of every row and,
+    as the second output, squared distances from the expanded form they
+    were chosen from (only within roundingMargin of the exact ones):
+        distances=None:  nothing
+        distances='all': to every centroid, N x k
+        distances='two': to the assigned centroid and to the closest of
+            the others, N x 2. A near-tied row gives its closest value
+            plus the tie margin and its closest value instead, which
+            still bound the distances either way the tie went.
+    '''
+    X = floatArray(dataSet)
+    C = np.asarray(centroids, dtype=X.dtype)
+    relative = roundingMargin(X)
+
+    # ||x - c||^2 = ||x||^2 - 2 x.c + ||c||^2, and ||x||^2 is the same for
+    # every centroid, so the closest centroid minimises ||c||^2 - 2 x.c
+    cNorm = np.einsum('ij,ij->i', C, C)
+    clusterAssment = np.empty(len(X), dtype=int)
+    sqDist = None
+    if distances == 'all':
+        sqDist = np.empty((len(X), len(C)))
+    elif distances == 'two':
+        sqDist = np.full((len(X), 2), np.inf)
+    for start in range(0, len(X), blockSize):
+        block = X[start:start + blockSize]
+        xx = np.einsum('ij,ij->i', block, block, dtype=float)
+        dist = cNorm - 2 * np.dot(block, C.T)
+        labels = np.argmin(dist, axis=1)
+        if distances == 'all':
+            np.add(dist, xx[:, None], out=sqDist[start:start + blockSize])
+
+        # the rounding of the expanded form depends on the BLAS kernel, so
+        # rows whose two closest centroids are within rounding distance are
+        # decided again from the coordinate differences, first minimum wins
+        rows = np.arange(len(block))
+        closest = dist[rows, labels]
+        second = np.full(len(block), np.inf)
+        if len(C) > 1:
+            dist[rows, labels] = np.inf
+            second = dist.min(axis=1)
+            scale = xx + cNorm.max()
+            tied = np.flatnonzero(second - closest <= relative * scale)
+            if len(tied):
+                labels[tied] = np.argmin(exactDistances(block[tied], C), axis=1)
+                second[tied] = closest[tied]
+                closest[tied] += relative * scale[tied]
+        if distances == 'two':
+            sqDist[start:start + blockSize, 0] = closest + xx
+            sqDist[start:start + blockSize, 1] = second + xx
+        clusterAssment[start:start + blockSize] = labels
 
-    dataSetCopy = copy.deepcopy(dataSet)
+    return clusterAssment, sqDist
 
-    for data in dataSetCopy:
-        minDist = -1
-        minIndex = -1
-        for cenInd, center in enumerate(centroids):
-            totalDist = 0
-            #print(data, center)
-            for dat, cen in zip(np.asarray(data).flatten(), np.asarray(center).flatten()):
-                #print(dat, cen)
-                totalDist += (dat - cen) ** 2
-            totalDist = sqrt(totalDist)
-            if minDist == -1 or totalDist < minDist:
-                minDist = totalDist
-                minIndex = cenInd
-        clusterAssment.append(minIndex)
 
-    return clusterAssment
+def exactDistances(X, C):
+    '''Euclidean distances between the rows of X and of C, summed one
+    coordinate at a time like the scalar loop, so equal distances come
+    out exactly equal'''
+    X = np.asarray(X, dtype=float)
+    C = np.asarray(C, dtype=float)
+    total = np.zeros((len(X), len(C)))
+    for j in range(X.shape[1]):
+        total += (X[:, j, None] - C[None, :, j]) ** 2
+    return np.sqrt(total)
 
 
-def getCentroid(dataSet, k, clusterAssment):
+def getCentroid(dataSet, k, clusterAssment, emptyCluster='farthest', previous=None,
+                sums=None, counts=None):
     '''recalculate centroids
     Input:
         dataSet: each row represents an observation and
@@ -70,59 +276,779 @@ def getCentroid(dataSet, k, clusterAssment):
         k:  number of clusters
         clusterAssment: list
             assigned cluster id for each data point
+        emptyCluster: what to do with a cluster that lost all its points
+            'farthest': reseed it at the point farthest from its own centroid
+            'keep':     keep its previous centroid (needs previous)
+            'drop':     remove it, so fewer than k centroids come back
+        previous: centroids of last iteration, used by 'keep'
+        sums, counts: per-cluster coordinate sums and sizes when the
+            caller already has them (see filterKMeans)
     Output:
         centroids: cluster centroids
     '''
+    X = floatArray(dataSet)
+    labels = np.asarray(clusterAssment, dtype=int)
+
+    if sums is None:
+        # one pass over the points instead of one strided pass per column
+        counts = np.bincount(labels, minlength=k)
+        sums = np.zeros((k, X.shape[1]))
+        if k <= 64:
+            # a block of one-hot rows times the block of points adds up
+            # every column of every cluster in one matrix product
+            blockSize = max(1, 2 ** 20 // k)
+            for start in range(0, len(X), blockSize):
+                block = labels[start:start + blockSize]
+                member = np.zeros((k, len(block)))
+                member[block, np.arange(len(block))] = 1
+                sums += np.dot(member, X[start:start + blockSize])
+        else:
+            # the one-hot product grows with k, so for many clusters sort
+            # the points by cluster and add up each run of rows
+            present = np.flatnonzero(counts)
+            order = np.argsort(labels, kind='stable')
+            starts = np.concatenate(([0], np.cumsum(counts[present])[:-1]))
+            sums[present] = np.add.reduceat(X[order], starts, axis=0, dtype=float)
+
+    empty = np.flatnonzero(counts == 0)
+    centroids = sums / np.maximum(counts, 1)[:, None]
+
+    if len(empty):
+        if emptyCluster == 'farthest':
+            dist = ((X - centroids[labels]) ** 2).sum(axis=1)
+            farthest = np.argsort(-dist, kind='stable')[:len(empty)]
+            centroids[empty[:len(farthest)]] = X[farthest]
+        elif emptyCluster == 'keep':
+            if previous is None:
+                raise ValueError("emptyCluster='keep' needs the previous centroids")
+            centroids[empty] = np.asarray(previous, dtype=float)[empty]
+        elif emptyCluster == 'drop':
+            centroids = np.delete(centroids, empty, axis=0)
+        else:
+            raise ValueError('unknown emptyCluster policy: %r' % (emptyCluster,))
+
+    return np.matrix(centroids)
+
+
+def dropLabels(clusterAssment, k):
+    '''Renumbers cluster ids after getCentroid dropped the empty ones
+    among k clusters, so they index the shrunk centroid matrix'''
+    labels = np.asarray(clusterAssment, dtype=int)
+    kept = np.bincount(labels, minlength=k) > 0
+    return (np.cumsum(kept) - 1)[labels]
+
+
+def clusterSSE(dataSet, centroids, clusterAssment):
+    '''within-cluster sum of squared distances (inertia)'''
+    X = floatArray(dataSet)
+    diff = X - np.asarray(centroids, dtype=float)[np.asarray(clusterAssment, dtype=int)]
+    return float(np.einsum('ij,ij->', diff, diff))
+
+
+_shared = {}  # dataset attached by the sharedMap workers
+
+
+def _attachDataset(name, shape, dtype):
+    '''Pool initializer: maps the shared memory block as the dataset'''
+    _shared['memory'] = shared_memory.SharedMemory(name=name)
+    _shared['data'] = np.ndarray(shape, dtype=dtype, buffer=_shared['memory'].buf)
+
+
+def sharedMap(X, func, tasks, n_jobs=1):
+    '''Runs func over tasks in n_jobs worker processes (-1 for one per
+    CPU), with X available to func as _shared['data']
+    X is copied once into a shared memory block that every worker maps,
+    instead of being pickled to each of them.
+    '''
+    if n_jobs == -1:
+        n_jobs = multiprocessing.cpu_count()
+    n_jobs = min(n_jobs, len(tasks))
+
+    if n_jobs > 1:
+        memory = shared_memory.SharedMemory(create=True, size=max(X.nbytes, 1))
+        try:
+            np.ndarray(X.shape, dtype=X.dtype, buffer=memory.buf)[:] = X
+            pool = multiprocessing.Pool(n_jobs, _attachDataset, (memory.name, X.shape, X.dtype.str))
+            try:
+                return pool.map(func, tasks)
+            finally:
+                pool.close()
+                pool.join()
+        finally:
+            memory.close()
+            memory.unlink()
+    else:
+        _shared['data'] = X
+        try:
+            return [func(task) for task in tasks]
+        finally:
+            _shared.clear()
+
+
+def _restart(args):
+    '''One seeded kMeans run on the attached dataset'''
+    seed, T, k, init, emptyCluster, algorithm, tol, criterion = args
+    X = _shared['data']
+    records = []
+    start = time.time()
+    centroids = initCentroids(X, k, init, seed)
+    centroids, clusterAssment = kMeans(X, T, k, centroids, emptyCluster, algorithm,
+                                       tol, criterion, records.append)
+    seconds = time.time() - start
+    run = {'seed': int(seed), 'inertia': clusterSSE(X, centroids, clusterAssment),
+           'seconds': seconds, 'iterations': len(records)}
+    return run, np.asarray(centroids), np.asarray(clusterAssment, dtype=np.int32)
+
+
+def kMeansRestarts(dataSet, T, k, n_init=10, n_jobs=1, init='kmeans++', seed=None,
+                   emptyCluster='farthest', algorithm='lloyd', tol=None, criterion='shift'):
+    '''Runs kMeans n_init times from differently seeded initial centroids
+    and keeps the run with the lowest within-cluster sum of squares
+    Restarts are spread over n_jobs worker processes (-1 for one per
+    CPU) by sharedMap, so the dataset is shared, not pickled per run.
+    Input:
+        dataSet: each row represents an observation and
+                each column represents an attribute
+        T:  maximum number of iterations of each run
+        k:  number of clusters
+        n_init: number of runs
+        n_jobs: number of worker processes
+        init: seeding method of initCentroids
+        seed: seed from which the per-run seeds are drawn
+    Output:
+        centroids: final centroids of the best run
+        clusterAssment: list
+            assigned cluster id for each data point in the best run
+        runs: list of dict
+            seed, inertia, seconds and iterations of every run, in run order
+    '''
+    X = np.ascontiguousarray(floatArray(dataSet))
+    seeds = np.random.RandomState(seed).randint(2 ** 31 - 1, size=n_init)
+    tasks = [(s, T, k, init, emptyCluster, algorithm, tol, criterion) for s in seeds]
+    results = sharedMap(X, _restart, tasks, n_jobs)
+
+    runs = [run for run, centroids, clusterAssment in results]
+    best = min(range(n_init), key=lambda i: runs[i]['inertia'])
+    run, centroids, clusterAssment = results[best]
+    return np.matrix(centroids), clusterAssment.tolist(), runs
+
+
+def splitCluster(dataSet, centroids, clusterAssment, sqDist, T=300, tol=1e-4):
+    '''Warm start for k + 1 clusters from a k-cluster solution
+    The cluster with the largest SSE, read off sqDist (each point's
+    squared distance to its centroid, kept from the k-cluster run), is
+    split in two by a 2-means run on its own points, seeded with its
+    centroid and its point farthest from it.
+    Output:
+        centroids: k + 1 initial centroids
+    '''
+    X = floatArray(dataSet)
+    C = np.array(centroids, dtype=float)
+    labels = np.asarray(clusterAssment, dtype=int)
+    sse = np.bincount(labels, weights=sqDist, minlength=len(C))
+    worst = np.argmax(sse)
+    members = np.flatnonzero(labels == worst)
+    farthest = X[members[np.argmax(sqDist[members])]]
+    pair, pairAssment = kMeans(X[members], T, 2, np.vstack([C[worst], farthest]), tol=tol)
+    C[worst] = pair[0]
+    return np.matrix(np.vstack([C, pair[1]]))
+
+
+def _sweepChain(args):
+    '''kMin..kMax warm-started runs on the attached dataset, or on a
+    uniform reference dataset over its bounding box'''
+    reference, kMin, kMax, T, tol, algorithm, seed = args
+    X = _shared['data']
+    if reference:
+        rng = np.random.RandomState(seed)
+        X = rng.uniform(X.min(axis=0), X.max(axis=0), size=X.shape)
+
+    chain = []
+    centroids = initCentroids(X, kMin, 'kmeans++', seed)
+    for k in range(kMin, kMax + 1):
+        start = time.time()
+        if k > kMin:
+            centroids = splitCluster(X, centroids, clusterAssment, sqDist, T, tol)
+        records = []
+        centroids, clusterAssment = kMeans(X, T, k, centroids, algorithm=algorithm, tol=tol,
+                                           callback=records.append)
+        diff = X - np.asarray(centroids)[clusterAssment]
+        sqDist = np.einsum('ij,ij->i', diff, diff)
+        chain.append({'k': k, 'inertia': float(sqDist.sum()), 'iterations': len(records),
+                      'seconds': time.time() - start})
+        if not reference:
+            chain[-1]['centroids'] = np.asarray(centroids)
+    return chain
+
+
+def kSweep(dataSet, kMin=1, kMax=10, T=300, tol=1e-4, nRefs=10, n_jobs=1, seed=None,
+           algorithm='lloyd'):
+    '''Runs kMeans for every k in kMin..kMax and scores the choice of k
+    Only kMin starts cold (k-means++); every next k is warm-started from
+    the previous solution by splitCluster. The gap statistic (Tibshirani
+    et al. 2001) repeats the same sweep on nRefs uniform reference
+    datasets over the bounding box of the data; the data sweep and the
+    reference sweeps are independent chains, run in parallel over
+    n_jobs processes by sharedMap.
+    Input:
+        dataSet: each row represents an observation and
+                each column represents an attribute
+        kMin, kMax: range of k
+        T, tol: iteration cap and convergence tolerance of every run
+        nRefs: number of reference datasets (0 skips the gap statistic)
+        n_jobs: number of worker processes, -1 for one per CPU
+        seed: seed of the initial centroids and the reference datasets
+    Output:
+        sweep: list of dict, one per k
+            k, inertia, iterations, seconds, centroids, elbow (second
+            difference of the inertia, None at the ends), and with nRefs
+            gap and gapStd
+        best: dict
+            the k picked by the largest elbow and, with nRefs, the
+            smallest k with gap(k) >= gap(k+1) - gapStd(k+1)
+    '''
+    X = np.ascontiguousarray(floatArray(dataSet))
+    seeds = np.random.RandomState(seed).randint(2 ** 31 - 1, size=nRefs + 1)
+    tasks = [(i > 0, kMin, kMax, T, tol, algorithm, s) for i, s in enumerate(seeds)]
+    chains = sharedMap(X, _sweepChain, tasks, n_jobs)
+
+    sweep = chains[0]
+    inertia = np.array([run['inertia'] for run in sweep])
+    for i, run in enumerate(sweep):
+        run['elbow'] = None
+        if 0 < i < len(sweep) - 1:
+            run['elbow'] = float((inertia[i - 1] - inertia[i]) - (inertia[i] - inertia[i + 1]))
+    best = {}
+    elbows = [run for run in sweep if run['elbow'] is not None]
+    if elbows:
+        best['elbow'] = max(elbows, key=lambda run: run['elbow'])['k']
 
-    dataSetCopy = copy.deepcopy(dataSet)
+    if nRefs:
+        with np.errstate(divide='ignore'):
+            logW = np.log(inertia)
+            refLogW = np.log([[run['inertia'] for run in chain] for chain in chains[1:]])
+        gap = refLogW.mean(axis=0) - logW
+        gapStd = refLogW.std(axis=0) * np.sqrt(1 + 1.0 / nRefs)
+        for i, run in enumerate(sweep):
+            run['gap'] = float(gap[i])
+            run['gapStd'] = float(gapStd[i])
+        best['gap'] = sweep[-1]['k']
+        for i in range(len(sweep) - 1):
+            if gap[i] >= gap[i + 1] - gapStd[i + 1]:
+                best['gap'] = sweep[i]['k']
+                break
 
-    centroids = []
-    #print(centroids)
+    return sweep, best
 
-    lastIndex = max(clusterAssment)
-    for cenInd in range(lastIndex + 1):
-        #print(cenInd)
-        indexes = np.where(np.array(clusterAssment) == cenInd)[0]
-        #print(indexes)
-        totalPoints = 0
-        for ind in indexes:
-            if isinstance(totalPoints, int):
-                totalPoints = copy.deepcopy(dataSet[ind])
+
+def pointDistances(X, C, blockSize=None):
+    '''Euclidean distance between every row of X and every row of C
+    Computed from the coordinate differences rather than the expanded
+    form, so the values are safe to use as triangle inequality bounds.
+    Rows are handled in blocks of blockSize (by default about 2^20
+    differences per block).
+    '''
+    if blockSize is None:
+        blockSize = max(1, 2 ** 20 // max(C.size, 1))
+    D = np.empty((len(X), len(C)))
+    for start in range(0, len(X), blockSize):
+        diff = X[start:start + blockSize, None, :] - C[None, :, :]
+        D[start:start + blockSize] = np.sqrt(np.einsum('ijk,ijk->ij', diff, diff))
+    return D
+
+
+def pairDistances(X, C, rows, cols, blockSize=None):
+    '''Euclidean distance between X[rows[i]] and C[cols[i]] for every i'''
+    if blockSize is None:
+        blockSize = max(1, 2 ** 20 // max(X.shape[1], 1))
+    d = np.empty(len(rows))
+    for start in range(0, len(rows), blockSize):
+        diff = X[rows[start:start + blockSize]] - C[cols[start:start + blockSize]]
+        d[start:start + blockSize] = np.sqrt(np.einsum('ij,ij->i', diff, diff))
+    return d
+
+
+class ConvergenceMonitor(object):
+    '''Per-iteration bookkeeping and stopping rule of kMeans
+    Besides the exact test (no point changed cluster), a run stops once
+    tol is reached by the chosen criterion:
+        'shift':   total squared centroid shift <= tol * mean feature variance
+        'inertia': relative change of the inertia <= tol
+    Every iteration produces a record with the number of points that
+    changed cluster, the inertia of the assignment, the total squared
+    centroid shift and the wall time, which is passed to callback and,
+    with log, written to that JSON file when the run ends.
+    '''
+    def __init__(self, dataSet, tol=None, criterion='shift', callback=None, log=None):
+        if criterion not in ('shift', 'inertia'):
+            raise ValueError('unknown convergence criterion: %r' % (criterion,))
+        self.dataSet = dataSet
+        self.tol = tol
+        self.criterion = criterion
+        self.callback = callback
+        self.log = log
+        self.records = []
+        self.inertia = None
+        self.withInertia = callback is not None or log is not None or (tol is not None and criterion == 'inertia')
+        if tol is not None and criterion == 'shift':
+            self.scale = float(floatArray(dataSet).var(axis=0, dtype=float).mean())
+        self.start = time.time()
+
+    def update(self, clusterAssment, changed, before, after):
+        '''Records one iteration, returns True when the run has converged
+        clusterAssment was computed from the centroids before, and after
+        are the centroids recomputed from it.
+        '''
+        before = np.asarray(before, dtype=float)
+        after = np.asarray(after, dtype=float)
+        shift = float(((after - before) ** 2).sum()) if before.shape == after.shape else float('inf')
+        record = {'iteration': len(self.records) + 1, 'changed': int(changed), 'shift': shift}
+
+        converged = changed == 0
+        if self.withInertia:
+            inertia = clusterSSE(self.dataSet, before, clusterAssment)
+            record['inertia'] = inertia
+            if self.tol is not None and self.criterion == 'inertia' and self.inertia is not None:
+                converged |= abs(self.inertia - inertia) <= self.tol * self.inertia
+            self.inertia = inertia
+        if self.tol is not None and self.criterion == 'shift':
+            converged |= shift <= self.tol * self.scale
+
+        now = time.time()
+        record['seconds'] = now - self.start
+        self.start = now
+        self.records.append(record)
+        if self.callback is not None:
+            self.callback(record)
+        return converged
+
+    def close(self):
+        if self.log is not None:
+            with open(self.log, 'w') as fw:
+                json.dump(self.records, fw, indent=2)
+
+
+def boundedKMeans(dataSet, T, k, centroids, emptyCluster='farthest', algorithm='elkan',
+                  tol=None, criterion='shift', callback=None, log=None):
+    '''k-means with triangle inequality bounds (Elkan 2003, Hamerly 2010)
+    Every point keeps an upper bound on the distance to its own centroid
+    and lower bounds on the distance to the others: one per centroid for
+    'elkan', one for the second closest centroid for 'hamerly'. Bounds
+    are loosened by how far the centroids moved, and only points whose
+    bounds cannot rule out a change get their distances recomputed.
+    Keeping N x k bounds makes 'elkan' pay off only when d is large
+    next to k; 'hamerly' is the cheaper choice otherwise.
+
+    A point is only kept without a recomputation when its bounds clear
+    the decision by a small floating point margin. A recomputation is
+    one row of expanded distances, chosen from like assignCluster does
+    and widened by that margin into the new bounds, so the centroids
+    and assignments are the same as the plain (Lloyd) kMeans.
+
+    Input/Output: as kMeans
+    '''
+    X = floatArray(dataSet)
+    n = len(X)
+    xx = np.einsum('ij,ij->i', X, X, dtype=float)
+    relative = roundingMargin(X)
+
+    monitor = ConvergenceMonitor(X, tol, criterion, callback, log)
+    labels = np.zeros(n, dtype=int)
+    upper = lower = None
+
+    i=1
+    while i < T:
+        pre_clusters = labels.copy()
+        C = np.asarray(centroids, dtype=float)
+
+        # a centroid is safely farther than the upper bound u when its
+        # lower bound passes sqrt(u^2 + margin), which clears the rounding
+        # error of the expanded distances used by assignCluster
+        margin = relative * (xx + np.einsum('ij,ij->i', C, C).max())
+
+        def nearest(points):
+            '''Recomputes X[points] from one row of distances each: the
+            labels, chosen like assignCluster, and the bounds, widened by
+            the rounding margin. Gathering more than half the rows costs
+            more than a pass over all of them, so then all are redone.'''
+            if 2 * len(points) > n:
+                points = slice(None)
+            if algorithm == 'hamerly':
+                lab, sq = closestCentroids(X[points], C, distances='two')
+                own, sq = sq[:, 0], sq[:, 1]
             else:
-                totalPoints += dataSet[ind]
-        #print(totalPoints)
-        totalPoints /= len(indexes)
-        #print(totalPoints.tolist()[0])
-        centroids.append(totalPoints.tolist()[0])
-    centroids = np.matrix(centroids)
+                lab, sq = closestCentroids(X[points], C, distances='all')
+                own = sq[np.arange(len(lab)), lab]
+            slack = margin[points]
+            labels[points] = lab
+            upper[points] = np.sqrt(own + slack)
+            sq -= slack if algorithm == 'hamerly' else slack[:, None]
+            lower[points] = np.sqrt(np.maximum(sq, 0, out=sq), out=sq)
 
-    return centroids
+        if upper is None:
+            upper = np.empty(n)
+            lower = np.empty((n, k)) if algorithm == 'elkan' else np.empty(n)
+            nearest(np.arange(n))
+        else:
+            cc = pointDistances(C, C)
+            np.fill_diagonal(cc, np.inf)
+            half = 0.5 * cc.min(axis=1)
+
+            reach = np.sqrt(upper * upper + margin)
+            if algorithm == 'hamerly':
+                check = np.flatnonzero(np.maximum(half[labels], lower) <= reach)
+            else:
+                check = np.flatnonzero(half[labels] <= reach)
+                # own centroid has cc = inf, so it is never a candidate
+                r = reach[check][:, None]
+                cand = (lower[check] <= r) & (cc[labels[check]] <= 2 * r)
+                # one BLAS row per point costs less than gathering its
+                # candidate pairs one by one, and renews all its bounds
+                check = check[cand.any(axis=1)]
+            if len(check):
+                nearest(check)
+
+        centroids = getCentroid(X, k, labels, emptyCluster, centroids)
+        dropped = len(centroids) != k
+        if dropped:
+            # a dropped cluster renumbers the rest, start the bounds over
+            upper = lower = None
+        else:
+            shift = pairDistances(C, np.asarray(centroids), np.arange(k), np.arange(k))
+            upper += shift[labels]
+            lower -= shift if algorithm == 'elkan' else shift.max()
+            np.maximum(lower, 0, out=lower)
+        i=i+1
+
+        converged = monitor.update(labels, np.count_nonzero(labels != pre_clusters), C, centroids)
+        if dropped:
+            labels = dropLabels(labels, k)
+            k = len(centroids)
+        if converged:
+            break
+
+    monitor.close()
+    return centroids, labels.tolist()
 
 
-def kMeans(dataSet, T, k, centroids):
+class KDTree(object):
+    '''KD-tree over the rows of a dataset, with the bounding box, the
+    number of points and the coordinate sum cached for every cell
+    Cells are split at the median of their widest dimension until they
+    hold at most leafSize points. The points of a cell are the rows
+    order[start[i]:end[i]] of the dataset; node arrays are indexed by
+    cell, with -1 as the child of a leaf.
+    '''
+    def __init__(self, dataSet, leafSize=64):
+        X = floatArray(dataSet)
+        self.order = np.arange(len(X))
+        start, end, left, right, lo, hi, sums = [], [], [], [], [], [], []
+
+        stack = [(0, len(X), -1, 0)]
+        while stack:
+            s, e, parent, side = stack.pop()
+            node = len(start)
+            if parent >= 0:
+                (left if side == 0 else right)[parent] = node
+            points = X[self.order[s:e]]
+            start.append(s)
+            end.append(e)
+            left.append(-1)
+            right.append(-1)
+            lo.append(points.min(axis=0))
+            hi.append(points.max(axis=0))
+            sums.append(points.sum(axis=0, dtype=float))
+
+            width = hi[-1] - lo[-1]
+            if e - s > leafSize and width.max() > 0:
+                dim = np.argmax(width)
+                m = (s + e) // 2
+                self.order[s:e] = self.order[s:e][np.argpartition(points[:, dim], m - s)]
+                stack.append((m, e, node, 1))
+                stack.append((s, m, node, 0))
+
+        self.start = np.array(start)
+        self.end = np.array(end)
+        self.left = np.array(left)
+        self.right = np.array(right)
+        self.lo = np.array(lo)
+        self.hi = np.array(hi)
+        self.sums = np.array(sums)
+        self.data = X[self.order]
+
+
+def filterAssign(tree, centroids, margin):
+    '''One filtering pass (Kanungo et al. 2002) over the KD-tree
+    Every cell carries the candidate centroids that may still own one of
+    its points. The candidate closest to the cell midpoint is z*; another
+    candidate z is dropped when even the cell corner furthest in the
+    direction z - z* is closer to z* than to z (by more than margin, so
+    rounding cannot turn a tie). A cell left with one candidate is
+    assigned as a whole from its cached sum and count; the points of a
+    leaf with more are compared with its candidates only, and near ties
+    go through assignCluster. The tree is
+    walked one level at a time, with all cells of a level filtered in
+    one vectorized step.
+    Output:
+        labels: cluster id of every point, in tree order
+        sums, counts: per-cluster coordinate sums and sizes
+    '''
+    C = np.asarray(centroids, dtype=float)
+    k = len(C)
+    labels = np.empty(len(tree.data), dtype=int)
+    sums = np.zeros_like(C)
+    counts = np.zeros(k, dtype=int)
+
+    # (cell, candidate) pairs of the cells on the current level
+    nodes = np.zeros(k, dtype=int)
+    cand = np.arange(k)
+    while len(nodes):
+        lo, hi = tree.lo[nodes], tree.hi[nodes]
+        toMid = ((C[cand] - 0.5 * (lo + hi)) ** 2).sum(axis=1)
+        order = np.lexsort((cand, toMid, nodes))
+        nodes, cand, lo, hi = nodes[order], cand[order], lo[order], hi[order]
+        first = np.flatnonzero(np.r_[True, nodes[1:] != nodes[:-1]])
+        group = np.cumsum(np.r_[False, nodes[1:] != nodes[:-1]])
+        best = cand[first][group]
+        cells = nodes[first]
+
+        Zbest = C[best]
+        corner = np.where(C[cand] > Zbest, hi, lo)
+        farther = ((C[cand] - corner) ** 2).sum(axis=1) - ((Zbest - corner) ** 2).sum(axis=1)
+        keep = (farther <= margin) | (cand == best)
+        nodes, cand, group = nodes[keep], cand[keep], group[keep]
+
+        left = np.bincount(group, minlength=len(cells))
+        start, end = tree.start[cells], tree.end[cells]
+
+        single = left == 1
+        if single.any():
+            owner = cand[np.searchsorted(group, np.flatnonzero(single))]
+            sizes = end[single] - start[single]
+            points = np.repeat(start[single] - np.cumsum(sizes) + sizes, sizes) + np.arange(sizes.sum())
+            labels[points] = np.repeat(owner, sizes)
+            np.add.at(sums, owner, tree.sums[cells[single]])
+            counts += np.bincount(owner, weights=sizes, minlength=k).astype(int)
+
+        leaf = ~single & (tree.left[cells] < 0)
+        if leaf.any():
+            # leaves are resolved point by point, but only against their
+            # own candidates: leaves with m candidates form a P x m block
+            inLeaf = leaf[group]
+            pairGroup, pairCand = group[inLeaf], cand[inLeaf]
+            order = np.lexsort((pairCand, pairGroup))
+            pairGroup, pairCand = pairGroup[order], pairCand[order]
+            for m in np.unique(left[leaf]):
+                ofSize = left[pairGroup] == m
+                candidates = pairCand[ofSize].reshape(-1, m)
+                leafCells = pairGroup[ofSize][::m]
+                sizes = end[leafCells] - start[leafCells]
+                points = np.repeat(start[leafCells] - np.cumsum(sizes) + sizes, sizes) + np.arange(sizes.sum())
+                X = tree.data[points]
+                candidates = np.repeat(candidates, sizes, axis=0)
+                diff = X[:, None, :] - C[candidates]
+                dist = np.einsum('ijk,ijk->ij', diff, diff)
+                lab = candidates[np.arange(len(points)), np.argmin(dist, axis=1)]
+
+                # near ties are settled exactly as assignCluster would
+                nearest = np.partition(dist, 1, axis=1)
+                tied = nearest[:, 1] - nearest[:, 0] <= margin
+                if tied.any():
+                    lab[tied] = assignCluster(X[tied], k, C)
+
+                labels[points] = lab
+                counts += np.bincount(lab, minlength=k)
+                for j in range(C.shape[1]):
+                    sums[:, j] += np.bincount(lab, weights=X[:, j], minlength=k)
+
+        split = (~single & ~leaf)[group]
+        nodes, cand = nodes[split], cand[split]
+        nodes = np.concatenate([tree.left[nodes], tree.right[nodes]])
+        cand = np.concatenate([cand, cand])
+    return labels, sums, counts
+
+
+def filterKMeans(dataSet, T, k, centroids, emptyCluster='farthest', tol=None, criterion='shift',
+                 callback=None, log=None, tree=None, leafSize=64):
+    '''Filtering k-means (Kanungo et al. 2002) for low-dimensional data
+    The KD-tree is built once (or passed in as tree, to reuse it across
+    runs); every iteration is a filterAssign pass, which settles whole
+    cells at once, so far fewer than N*k distances are computed.
+
+    Points are assigned like assignCluster, ties going to the lowest
+    centroid index, and empty clusters are handled by getCentroid on the
+    data in its original row order. The centroids come from the cached
+    cell sums, though, so they can differ from plain kMeans in the last
+    bits, and a point equidistant from two centroids up to rounding may
+    then be tied differently in a later iteration. Away from such ties
+    the clustering is the same.
+
+    Input/Output: as kMeans
+    '''
+    if tree is None:
+        tree = KDTree(dataSet, leafSize)
+    X = floatArray(dataSet)
+    xNorm = np.einsum('ij,ij->i', X, X, dtype=float).max() if len(X) else 0.0
+    relative = roundingMargin(X)
+    monitor = ConvergenceMonitor(X, tol, criterion, callback, log)
+    clusterAssment = np.zeros(len(X), dtype=int)
+
+    i=1
+    while i < T:
+        pre_clusters = clusterAssment
+        before = centroids
+        C = np.asarray(centroids, dtype=float)
+        margin = relative * (xNorm + np.einsum('ij,ij->i', C, C).max())
+        labels, sums, counts = filterAssign(tree, C, margin)
+        # back from tree order to row order
+        clusterAssment = np.empty(len(X), dtype=int)
+        clusterAssment[tree.order] = labels
+        centroids = getCentroid(X, k, clusterAssment, emptyCluster, centroids, sums, counts)
+        i=i+1
+
+        converged = monitor.update(clusterAssment, np.count_nonzero(clusterAssment != pre_clusters), before, centroids)
+        if len(centroids) != k:
+            clusterAssment = dropLabels(clusterAssment, k)
+            k = len(centroids)
+        if converged:
+            break
+
+    monitor.close()
+    return centroids, clusterAssment.tolist()
+
+
+def kMeans(dataSet, T, k, centroids, emptyCluster='farthest', algorithm='lloyd',
+           tol=None, criterion='shift', callback=None, log=None):
     '''
     Input:
         dataSet: each row represents an observation and
                 each column represents an attribute
-        T:  number of iterations
+        T:  maximum number of iterations
         k:  number of clusters
         centroids: initial centroids
+        emptyCluster: empty cluster policy of getCentroid,
+                'farthest', 'keep' or 'drop'
+        algorithm: 'lloyd', or 'elkan' / 'hamerly' to skip the distance
+                computations ruled out by the triangle inequality
+                (same result, see boundedKMeans), or 'filter' for
+                the KD-tree filtering algorithm (see filterKMeans)
+        tol, criterion: also stop once the centroid shift or the relative
+                inertia change is below tol (see ConvergenceMonitor);
+                with tol=None only a run without changes stops early
+        callback: called with the record of every iteration
+        log: JSON file receiving the records of all iterations
     Output:
         centroids: final cluster centroids
         clusterAssment: list
             assigned cluster id for each data point
     '''
-    clusterAssment = [0] * len(dataSet)
-    pre_clusters  = [1] * len(dataSet)
+    if algorithm in ('elkan', 'hamerly'):
+        return boundedKMeans(dataSet, T, k, centroids, emptyCluster, algorithm,
+                             tol, criterion, callback, log)
+    elif algorithm == 'filter':
+        return filterKMeans(dataSet, T, k, centroids, emptyCluster, tol, criterion, callback, log)
+    elif algorithm != 'lloyd':
+        raise ValueError('unknown algorithm: %r' % (algorithm,))
+
+    monitor = ConvergenceMonitor(dataSet, tol, criterion, callback, log)
+    clusterAssment = np.zeros(len(dataSet), dtype=int)
 
     i=1
-    while i < T and list(pre_clusters) != list(clusterAssment):
-        pre_clusters = copy.deepcopy(clusterAssment)
-        clusterAssment = assignCluster(dataSet, k, centroids )
-        centroids      = getCentroid(dataSet, k, clusterAssment)
+    while i < T:
+        pre_clusters   = clusterAssment
+        clusterAssment = np.asarray(assignCluster(dataSet, k, centroids ))
+        before         = centroids
+        centroids      = getCentroid(dataSet, k, clusterAssment, emptyCluster, centroids)
         i=i+1
 
-    return centroids, clusterAssment
+        converged = monitor.update(clusterAssment, np.count_nonzero(clusterAssment != pre_clusters), before, centroids)
+        if len(centroids) != k:
+            clusterAssment = dropLabels(clusterAssment, k)
+            k = len(centroids)
+        if converged:
+            break
+
+    monitor.close()
+    return centroids, clusterAssment.tolist()
+
+
+def iterChunks(fileName, chunkSize=10000):
+    '''Reads a comma separated data file chunkSize rows at a time
+    (a .npy file is memory-mapped and sliced instead)
+    Output:
+        generator of arrays, each with at most chunkSize rows
+    '''
+    if fileName.endswith('.npy'):
+        data = np.load(fileName, mmap_mode='r')
+        for start in range(0, len(data), chunkSize):
+            yield np.asarray(data[start:start + chunkSize])
+        return
+
+    chunk = []
+    with open(fileName) as fr:
+        for line in fr:
+            line = line.strip()
+            if not line:
+                continue
+            chunk.append(list(map(float, line.split(','))))
+            if len(chunk) == chunkSize:
+                yield np.array(chunk)
+                chunk = []
+    if chunk:
+        yield np.array(chunk)
+
+
+def miniBatchKMeans(fileName, k, centroids, chunkSize=1000, epochs=3):
+    '''Mini-batch k-means streamed from a data file (Sculley 2010)
+    Each chunk of the file is one mini-batch: its points are assigned to
+    the closest centroid, then every centroid moves towards them with a
+    per-centroid learning rate of 1 / (points it has seen so far). Only
+    one chunk is in memory at a time, so the file may be far larger
+    than RAM.
+    Input:
+        fileName: comma separated data file, one observation per row
+        k:  number of clusters
+        centroids: initial centroids
+        chunkSize: number of rows per mini-batch
+        epochs: number of passes over the file
+    Output:
+        centroids: final cluster centroids
+    '''
+    C = np.array(centroids, dtype=float)
+    counts = np.zeros(k)
+
+    for epoch in range(epochs):
+        for batch in iterChunks(fileName, chunkSize):
+            labels = np.asarray(assignCluster(batch, k, C), dtype=int)
+            batchCounts = np.bincount(labels, minlength=k)
+            sums = np.empty_like(C)
+            for j in range(C.shape[1]):
+                sums[:, j] = np.bincount(labels, weights=batch[:, j], minlength=k)
+
+            # applying c <- (1 - 1/v) c + (1/v) x point by point is the
+            # running mean, so a whole batch can be folded in at once
+            counts += batchCounts
+            seen = counts > 0
+            C[seen] += (sums[seen] - batchCounts[seen, None] * C[seen]) / counts[seen, None]
+
+    return np.matrix(C)
+
+
+def streamAssign(fileName, save_filename, centroids, chunkSize=10000):
+    '''Final streaming pass: writes every row of fileName with its
+    assigned cluster id appended, in the format of saveData
+    Output:
+        clusterSizes: number of points in each cluster
+    '''
+    k = len(centroids)
+    clusterSizes = np.zeros(k, dtype=int)
+    with open(save_filename, 'w', newline = '') as f:
+        writer = csv.writer(f)
+        for chunk in iterChunks(fileName, chunkSize):
+            labels = assignCluster(chunk, k, centroids)
+            clusterSizes += np.bincount(labels, minlength=k)
+            writer.writerows(row + [label] for row, label in zip(chunk.tolist(), labels))
+    return clusterSizes
 
 
 def saveData(save_filename, data, clusterAssment):
@@ -137,22 +1063,50 @@ def saveData(save_filename, data, clusterAssment):
 
 
 if __name__ == '__main__':
-    if len(sys.argv) == 4:
+    algorithm = 'lloyd'
+    if len(sys.argv) in (4, 5):
         data_filename = sys.argv[1]
         centroid_filename = sys.argv[2]
         k = int(sys.argv[3])
+        if len(sys.argv) == 5:
+            algorithm = sys.argv[4]
     else:
         data_filename = 'Iris.csv'
         centroid_filename = 'Iris_Initial_Centroids.csv'
         k = 3
 
-    save_filename = data_filename.replace('.csv', '_kmeans_cluster.csv')
+    save_filename = os.path.splitext(data_filename)[0] + '_kmeans_cluster.csv'
+
+    # the centroid argument is either a file or a seeding method
+    seeding = centroid_filename in ('kmeans++', 'kmeans||', 'random')
+    if algorithm == 'minibatch':
+        if seeding:
+            # seed from the first chunk only, the file may not fit in memory
+            centroids = initCentroids(next(iterChunks(data_filename)), k, centroid_filename)
+        else:
+            centroids = loadCenterSet(centroid_filename)
+        centroids = miniBatchKMeans(data_filename, k, centroids)
+        print(centroids)
+        streamAssign(data_filename, save_filename, centroids)
+    else:
+        data = loadDataSet(data_filename)
+        if seeding:
+            # no fixed start, so keep the best of several seeded runs
+            centroids, clusterAssment, runs = kMeansRestarts(data, 300, k, init=centroid_filename,
+                                                             algorithm=algorithm, tol=1e-4)
+        else:
+            centroids = loadCenterSet(centroid_filename)
+            centroids, clusterAssment = kMeans(data, 300, k, centroids, algorithm=algorithm, tol=1e-4,
+                                               log=save_filename.replace('.csv', '_log.json'))
+        print(centroids)
+        saveData(save_filename, data, clusterAssment)
+
+
+    ### Example: python kmeans_template.py Iris.csv Iris_Initial_Centroids.csv 3
 
-    data = loadDataSet(data_filename)
-    centroids = loadCenterSet(centroid_filename)
-    centroids, clusterAssment = kMeans(data, 7, k, centroids )
-    print(centroids)
-    saveData(save_filename, data, clusterAssment)
+    ### Example: python kmeans_template.py YeastGene.csv YeastGene_Initial_Centroids.csv 6 minibatch
 
+    ### Example: python kmeans_template.py YeastGene.csv kmeans++ 6
 
-    ### Example: python kmeans_template.py Iris.csv Iris_Initial_Centroids.csv
+    ### Example: python kmeans_template.py YeastGene.float32.npy kmeans++ 6
+    ###          (YeastGene.float32.npy is written by loadDataSet('YeastGene.csv', 'float32'))